@@ -0,0 +1,43 @@
+import hashlib
+import os
+from collections import Counter
+import numpy as np
+
+CACHE_VERSION = 1
+READ_SIZE = 1 << 20
+
+
+def cache_key(file_path, config):  # sha256 of the raw book bytes and the tokenizer configuration
+    digest = hashlib.sha256(f"v{CACHE_VERSION}|{config}|".encode('utf-8'))
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.npz")
+
+
+def load_counts(cache_dir, key):  # returns the cached Counter, or None when there is no entry for this key
+    path = cache_path(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        words = data['words'].tobytes().decode('utf-8').split('\n') if data['counts'].size else []
+        counts = data['counts'].tolist()
+    return Counter(dict(zip(words, counts)))
+
+
+def save_counts(cache_dir, key, dictionary):  # words are stored newline-joined, in order of first appearance
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+
+    words = np.frombuffer('\n'.join(dictionary).encode('utf-8'), dtype=np.uint8)
+    counts = np.fromiter(dictionary.values(), dtype=np.int64, count=len(dictionary))
+
+    path = cache_path(cache_dir, key)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as file:
+        np.savez(file, words=words, counts=counts)
+    os.replace(temp_path, path)  # atomic, so parallel workers never see a half-written entry
@@ -1,30 +1,169 @@
 import string
 import os
-from nltk.tokenize import word_tokenize
-from collections import Counter
+import re
+import json
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import time
+import numpy as np
 import matplotlib.pyplot as plt
-def tokenize_text(file_path):
+from counts_cache import cache_key, load_counts, save_counts
+from zipf_fit import fit_point, zipf_mandelbrot_pmf, zipf_report
+
+CHUNK_SIZE = 1 << 20  # characters read from a book at a time
+CACHE_DIR = os.path.join('output', 'cache')  # None turns the on-disk cache off
+MAX_PLOT_POINTS = 2000  # points drawn per curve, None draws every rank
+PUNCTUATION = string.punctuation + '“”‘’"'
+PUNCTUATION_TABLE = str.maketrans('', '', PUNCTUATION)
+LAST_WHITESPACE = re.compile(r'\s\S*\Z')
+
+# what NLTK's word_tokenize still does to text that has already lost its punctuation:
+# pads the remaining quote and dash characters and splits the MacIntyre contractions
+SEPARATE_CHARACTERS = re.compile('[«„»\u2012-\u2015]')
+CONTRACTIONS = re.compile(r'\b(can(?=not\b)|gim(?=me\b)|gon(?=na\b)|got(?=ta\b)|lem(?=me\b)|wan(?=na\s))', re.IGNORECASE)
+
+# words and counts are ordered by descending count, ties kept in order of first appearance
+BookAnalysis = namedtuple('BookAnalysis', ['dictionary', 'total', 'words', 'counts', 'rank_values', 'freq_values'])
+
+
+def iter_chunks(file_path, chunk_size=CHUNK_SIZE):  # yields pieces of the book cut on whitespace, so no word is split
     with open(file_path, 'r') as file:
-        data = file.read()
-        clear_data = data.translate(str.maketrans('', '', string.punctuation + '“”‘’"')).lower()
-        tokenized_text = word_tokenize(clear_data)
-    return tokenized_text
-
-def count_frequencies(book_path):  # returns a dictionary with words as keys and their frequencies as values
-    tokenized_text = tokenize_text(book_path)
-    total = sum(1 for word in tokenized_text)
-    dictionary = Counter(tokenized_text)
-    frequencies = {word: count / total for word, count in dictionary.items()}
-    sorted_dict = dict(sorted(frequencies.items(), key=lambda item: item[1], reverse=True))
-    return sorted_dict, dictionary, total
-
-def count_ranks(book_path):  # returns a dictionary with words as keys and their ranks as values
-    frequencies, dictionary, total = count_frequencies(book_path)
-    sorted_frequencies = sorted(frequencies.items(), key=lambda item: item[1], reverse=True)
-    ranks = {}
-    for rank, (word, frequency) in enumerate(sorted_frequencies, start=1):
-        ranks[word] = rank
-    return ranks, dictionary, total
+        tail = ''
+        while True:
+            block = file.read(chunk_size)
+            if not block:
+                break
+            block = tail + block
+            match = LAST_WHITESPACE.search(block)
+            if match is None:  # a single word longer than the chunk, keep reading
+                tail = block
+                continue
+            cut = match.start() + 1
+            yield block[:cut]
+            tail = block[cut:]
+        if tail:
+            yield tail
+
+
+def regex_tokenize(clear_data):  # same tokens as word_tokenize for text with the punctuation already stripped
+    padded = SEPARATE_CHARACTERS.sub(r' \g<0> ', clear_data) + ' '
+    return CONTRACTIONS.sub(r'\1 ', padded).split()
+
+
+def nltk_tokenize(clear_data):
+    from nltk.tokenize import word_tokenize  # imported only when this backend is selected
+    return word_tokenize(clear_data)
+
+
+TOKENIZERS = {'regex': regex_tokenize, 'nltk': nltk_tokenize}
+DEFAULT_TOKENIZER = 'regex'
+
+
+def tokenize_chunk(chunk, tokenizer=DEFAULT_TOKENIZER):
+    clear_data = chunk.translate(PUNCTUATION_TABLE).lower()
+    return TOKENIZERS[tokenizer](clear_data)
+
+
+def iter_tokens(file_path, chunk_size=CHUNK_SIZE, tokenizer=DEFAULT_TOKENIZER):
+    for chunk in iter_chunks(file_path, chunk_size):
+        yield from tokenize_chunk(chunk, tokenizer)
+
+
+def tokenize_text(file_path, tokenizer=DEFAULT_TOKENIZER):
+    return list(iter_tokens(file_path, tokenizer=tokenizer))
+
+
+def compare_tokenizers(book_paths, tokenizers=('nltk', 'regex')):  # parity check and throughput of the tokenizer backends
+    reference = tokenizers[0]
+    for book_path in book_paths:
+        chunks = [chunk.translate(PUNCTUATION_TABLE).lower() for chunk in iter_chunks(book_path)]
+        results = {}
+        for tokenizer in tokenizers:
+            start = time.perf_counter()
+            tokens = [token for chunk in chunks for token in TOKENIZERS[tokenizer](chunk)]
+            elapsed = time.perf_counter() - start
+            results[tokenizer] = tokens
+            print(f"{os.path.basename(book_path)} [{tokenizer}]: {len(tokens)} tokens in {elapsed:.3f} s "
+                  f"({len(tokens) / elapsed:,.0f} tokens/s)")
+        for tokenizer in tokenizers[1:]:
+            print(f"Same tokens as {reference}: {results[tokenizer] == results[reference]}")
+        print()
+
+
+def tokenizer_config(tokenizer):  # everything that changes the token stream, part of the cache key
+    config = [tokenizer, PUNCTUATION]
+    if tokenizer == 'regex':
+        config += [SEPARATE_CHARACTERS.pattern, CONTRACTIONS.pattern]
+    elif tokenizer == 'nltk':
+        import nltk
+        config.append(nltk.__version__)
+    return '|'.join(config)
+
+
+def count_words(book_path, tokenizer=DEFAULT_TOKENIZER, cache_dir=CACHE_DIR):  # streams the book once and returns its Counter, words in order of first appearance
+    key = cache_key(book_path, tokenizer_config(tokenizer)) if cache_dir else None
+    if key is not None:
+        dictionary = load_counts(cache_dir, key)
+        if dictionary is not None:
+            return dictionary
+
+    dictionary = Counter()
+    for chunk in iter_chunks(book_path):
+        dictionary.update(tokenize_chunk(chunk, tokenizer))
+
+    if key is not None:
+        save_counts(cache_dir, key, dictionary)
+    return dictionary
+
+
+def rank_counter(dictionary):  # builds the rank/frequency arrays from a Counter without touching any text
+    total = sum(dictionary.values())
+    ranked = dictionary.most_common()
+    words = [word for word, count in ranked]
+    counts = np.fromiter((count for word, count in ranked), dtype=np.int64, count=len(ranked))
+    rank_values = np.arange(1, len(ranked) + 1)
+    freq_values = counts / total if total else counts.astype(float)
+    return BookAnalysis(dictionary, total, words, counts, rank_values, freq_values)
+
+
+book_analyses = {}  # (book path, tokenizer) -> BookAnalysis, shared by every consumer
+
+
+def analyze_book(book_path, tokenizer=DEFAULT_TOKENIZER):
+    key = (book_path, tokenizer)
+    if key not in book_analyses:
+        book_analyses[key] = rank_counter(count_words(book_path, tokenizer))
+    return book_analyses[key]
+
+
+def analyze_books(book_paths, workers=None, tokenizer=DEFAULT_TOKENIZER):  # tokenizes and counts the books not analysed yet across a process pool
+    pending = [book_path for book_path in dict.fromkeys(book_paths) if (book_path, tokenizer) not in book_analyses]
+    if len(pending) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for book_path, dictionary in zip(pending, pool.map(partial(count_words, tokenizer=tokenizer), pending)):
+                book_analyses[(book_path, tokenizer)] = rank_counter(dictionary)
+    for book_path in pending:
+        analyze_book(book_path, tokenizer)
+    return {book_path: book_analyses[(book_path, tokenizer)] for book_path in book_paths}
+
+
+def merge_analyses(analyses):  # corpus-wide rank/frequency table from the per-book counters
+    corpus = Counter()
+    for analysis in analyses:
+        corpus.update(analysis.dictionary)
+    return rank_counter(corpus)
+
+
+def count_frequencies(book_path, tokenizer=DEFAULT_TOKENIZER):  # returns a dictionary with words as keys and their frequencies as values
+    analysis = analyze_book(book_path, tokenizer)
+    sorted_dict = dict(zip(analysis.words, analysis.freq_values.tolist()))
+    return sorted_dict, analysis.dictionary, analysis.total
+
+def count_ranks(book_path, tokenizer=DEFAULT_TOKENIZER):  # returns a dictionary with words as keys and their ranks as values
+    analysis = analyze_book(book_path, tokenizer)
+    ranks = dict(zip(analysis.words, analysis.rank_values.tolist()))
+    return ranks, analysis.dictionary, analysis.total
 
 def save_analysis_to_file(book_path, ranks, dictionary, total, output_dir='output'):
     if not os.path.exists(output_dir):
@@ -41,37 +180,65 @@ def save_analysis_to_file(book_path, ranks, dictionary, total, output_dir='outpu
             frequency = count / total
             file.write(f"{rank}\t{word}\t{count}\t{frequency:.6f}\n")
 
-def plot_graph(book_paths, scale):
+def save_corpus_analysis(book_paths, output_dir='output', workers=None, tokenizer=DEFAULT_TOKENIZER):  # batch mode, one pool run for all books
+    analyses = analyze_books(book_paths, workers, tokenizer)
+    for book_path in analyses:
+        ranks, dictionary, total = count_ranks(book_path, tokenizer)
+        save_analysis_to_file(book_path, ranks, dictionary, total, output_dir)
+
+    corpus = merge_analyses(analyses.values())
+    corpus_ranks = dict(zip(corpus.words, corpus.rank_values.tolist()))
+    save_analysis_to_file('corpus', corpus_ranks, corpus.dictionary, corpus.total, output_dir)
+    return corpus
+
+def save_zipf_report(book_path, output_dir='output', n_boot=200, seed=None, tokenizer=DEFAULT_TOKENIZER):
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    analysis = analyze_book(book_path, tokenizer)
+    report = zipf_report(analysis.counts, n_boot=n_boot, seed=seed)
+    report['book'] = os.path.basename(book_path).replace('.txt', '')
+    report['tokenizer'] = tokenizer
+
+    file_path = os.path.join(output_dir, f"{report['book']}_zipf_fit.json")
+    with open(file_path, 'w') as file:
+        json.dump(report, file, indent=2)
+    return report
+
+def downsample_ranks(n_ranks, max_points=MAX_PLOT_POINTS):  # indices of the ranks to draw, log-spaced for the tail plus evenly spaced for the head
+    if max_points is None or n_ranks <= max_points:
+        return np.arange(n_ranks)
+    log_spaced = np.geomspace(1, n_ranks, max_points // 2).astype(np.int64) - 1
+    even_spaced = np.linspace(0, n_ranks - 1, max_points - max_points // 2).astype(np.int64)
+    return np.union1d(log_spaced, even_spaced)
+
+def plot_graph(book_paths, scale, tokenizer=DEFAULT_TOKENIZER, fit=False, max_points=MAX_PLOT_POINTS, output_file=None):
     plt.figure(figsize=(12, 6))
     plt.style.use('seaborn-v0_8-deep')
     colors = ['r', 'g', 'b', 'm']
 
     for i, book_path in enumerate(book_paths):
-        frequencies, dictionary, total = count_frequencies(book_path)
-        ranks, _, _ = count_ranks(book_path)
+        analysis = analyze_book(book_path, tokenizer)
+        shown = downsample_ranks(len(analysis.rank_values), max_points)
+        freq_values = analysis.freq_values[shown]
+        rank_values = analysis.rank_values[shown]
 
-        sorted_frequencies = sorted(frequencies.items(), key=lambda item: item[1], reverse=True)
-        sorted_ranks = sorted(ranks.items(), key=lambda item: item[1])
+        book_title = os.path.basename(book_path).replace('.txt', '')
 
-        freq_values = [freq for word, freq in sorted_frequencies]
-        rank_values = [rank for word, rank in sorted_ranks]
+        color = colors[i % len(colors)]
+        plot = {'log-log': plt.loglog, 'linear': plt.plot}[scale]
 
-        book_title = os.path.basename(book_path).replace('.txt', '')
+        plot(rank_values, freq_values, marker='o', markersize=1, linestyle='-', color=color,
+             label=f'Empirical for {book_title}')
+        C = freq_values[0]  # constant for Zipf's Law
+        zipf_values = C / rank_values
+        plot(rank_values, zipf_values, linestyle='--', color=color, label=f'Theoretical Zipf for {book_title}')
 
-        if scale == 'log-log':
-            plt.loglog(rank_values, freq_values, marker='o', markersize=1, linestyle='-', color=colors[i % len(colors)],
-                       label=f'Empirical for {book_title}')
-            C = freq_values[0]  # constant for Zipf's Law
-            zipf_values = [C / (rank) for rank in rank_values]
-            plt.loglog(rank_values, zipf_values, linestyle='--', color=colors[i % len(colors)],
-                       label=f'Theoretical Zipf for {book_title}')
-        elif scale == 'linear':
-            plt.plot(rank_values, freq_values, marker='o', markersize=1, linestyle='-', color=colors[i % len(colors)],
-                     label=f'Empirical for {book_title}')
-            C = freq_values[0]
-            zipf_values = [C / (rank) for rank in rank_values]
-            plt.plot(rank_values, zipf_values, linestyle='--', color=colors[i % len(colors)],
-                     label=f'Theoretical Zipf for {book_title}')
+        if fit:
+            s, q = fit_point(analysis.counts, 'zipf-mandelbrot')
+            fitted_values = zipf_mandelbrot_pmf(analysis.rank_values, s, q)[shown]
+            plot(rank_values, fitted_values, linestyle=':', color=color,
+                 label=f'Zipf-Mandelbrot fit for {book_title} (s={s:.3f}, q={q:.2f})')
 
     if scale == 'log-log':
         plt.ylim(0.000001, 0.1)
@@ -85,14 +252,21 @@ def plot_graph(book_paths, scale):
     plt.legend(loc='best', fontsize=12)
     plt.grid(True, which='both', linestyle='--', linewidth=0.5)
     plt.tight_layout()
-    plt.show()
+    if output_file is None:
+        plt.show()
+    else:  # headless batch runs
+        plt.savefig(output_file, dpi=150)
+        plt.close()
 
-book_paths = ['project1/Middlemarch.txt', 'project1/The-Adventures-of-Roderick-Random.txt', 'project1/The-Castle-of-Otranto.txt','project1/Ulysses.txt']
-""" for book_path in book_paths:
-    ranks, dictionary, total = count_ranks(book_path)
-    save_analysis_to_file(book_path, ranks, dictionary, total)"""
+if __name__ == '__main__':
+    book_paths = ['project1/Middlemarch.txt', 'project1/The-Adventures-of-Roderick-Random.txt', 'project1/The-Castle-of-Otranto.txt','project1/Ulysses.txt']
+    """ save_corpus_analysis(book_paths)"""
+    """ compare_tokenizers(book_paths)"""
+    """ for book_path in book_paths:
+        save_zipf_report(book_path)"""
 
-plot_graph(book_paths, scale='log-log')
-plot_graph(book_paths, scale='linear')
+    analyze_books(book_paths)
+    plot_graph(book_paths, scale='log-log')
+    plot_graph(book_paths, scale='linear')
 
 
@@ -0,0 +1,150 @@
+import numpy as np
+from scipy.optimize import minimize
+
+MODELS = ('zipf', 'zipf-mandelbrot')
+BATCH_ELEMENTS = 1 << 21  # size of the (replicates x types) blocks the bootstrap works on
+S_BOUNDS = (1e-3, 10.0)
+Q_BOUNDS = (-1 + 1e-6, 1e3)  # rank + q has to stay positive for rank = 1
+NEWTON_STEPS = 50
+MAX_STEP = np.array([0.1, 1.0])  # largest change of (s, q) in one Newton step
+
+
+# p(r) = (r + q)^-s / Z(s, q) over the observed ranks r = 1..N; q = 0 is plain Zipf
+def zipf_mandelbrot_pmf(ranks, s, q=0.0):
+    log_x = np.log(ranks + q)
+    weights = np.exp(-s * (log_x - log_x[0]))
+    return weights / weights.sum()
+
+
+def likelihood_terms(counts, ranks, s, q):  # per-token negative log-likelihood with its gradient and Hessian in (s, q), one row per sample
+    c = counts / counts.sum(axis=1, keepdims=True)
+    x = ranks + q[:, None]
+    log_x = np.log(x)
+    inv_x = 1.0 / x
+
+    weights = np.exp(-s[:, None] * (log_x - log_x[:, :1]))
+    z = weights.sum(axis=1)
+    p = weights / z[:, None]
+    log_z = np.log(z) - s * log_x[:, 0]
+
+    data_log = (c * log_x).sum(axis=1)
+    data_inv = (c * inv_x).sum(axis=1)
+    data_inv2 = (c * inv_x ** 2).sum(axis=1)
+
+    mean_log = (p * log_x).sum(axis=1)
+    mean_inv = (p * inv_x).sum(axis=1)
+    mean_inv2 = (p * inv_x ** 2).sum(axis=1)
+    centered_log = log_x - mean_log[:, None]
+    centered_inv = inv_x - mean_inv[:, None]
+    var_log = (p * centered_log ** 2).sum(axis=1)
+    var_inv = (p * centered_inv ** 2).sum(axis=1)
+    cov = (p * centered_log * centered_inv).sum(axis=1)
+
+    value = s * data_log + log_z
+    grad = np.stack([data_log - mean_log, s * (data_inv - mean_inv)], axis=1)
+    h_ss = var_log
+    h_sq = data_inv - mean_inv + s * cov
+    h_qq = -s * data_inv2 + s ** 2 * var_inv + s * mean_inv2
+    hess = np.stack([np.stack([h_ss, h_sq], axis=1), np.stack([h_sq, h_qq], axis=1)], axis=1)
+    return value, grad, hess
+
+
+def fit_point(counts, model='zipf', start=None):  # maximum-likelihood (s, q) for one rank-ordered count array
+    ranks = np.arange(1, counts.size + 1, dtype=float)
+    rows = counts[None, :].astype(float)
+
+    if model == 'zipf':
+        def objective(params):
+            value, grad, _ = likelihood_terms(rows, ranks, params[:1], np.zeros(1))
+            return value[0], grad[0, :1]
+        result = minimize(objective, [1.0 if start is None else start[0]], jac=True, method='L-BFGS-B',
+                          bounds=[S_BOUNDS])
+        return np.array([result.x[0], 0.0])
+
+    def objective(params):
+        value, grad, _ = likelihood_terms(rows, ranks, params[:1], params[1:])
+        return value[0], grad[0]
+    if start is None:
+        start = fit_point(counts, 'zipf')
+    result = minimize(objective, start, jac=True, method='L-BFGS-B', bounds=[S_BOUNDS, Q_BOUNDS])
+    return result.x
+
+
+def newton_fit(counts, ranks, start, model='zipf', steps=NEWTON_STEPS, tol=1e-9):  # damped Newton on every row of counts at once
+    s = np.full(len(counts), start[0])
+    q = np.full(len(counts), start[1] if model != 'zipf' else 0.0)
+
+    for _ in range(steps):
+        _, grad, hess = likelihood_terms(counts, ranks, s, q)
+        if model == 'zipf':
+            step = np.stack([grad[:, 0] / hess[:, 0, 0], np.zeros_like(s)], axis=1)
+        else:
+            det = hess[:, 0, 0] * hess[:, 1, 1] - hess[:, 0, 1] ** 2
+            definite = (det > 0) & (hess[:, 0, 0] > 0)
+            newton_step = np.stack([hess[:, 1, 1] * grad[:, 0] - hess[:, 0, 1] * grad[:, 1],
+                                    hess[:, 0, 0] * grad[:, 1] - hess[:, 0, 1] * grad[:, 0]], axis=1)
+            newton_step /= np.where(definite, det, 1.0)[:, None]
+            # away from the optimum the Hessian can be indefinite, fall back to a scaled gradient step there
+            diagonal = np.abs(np.stack([hess[:, 0, 0], hess[:, 1, 1]], axis=1)) + 1e-12
+            step = np.where(definite[:, None], newton_step, grad / diagonal)
+
+        step = np.clip(step, -MAX_STEP, MAX_STEP)
+        s = np.clip(s - step[:, 0], *S_BOUNDS)
+        q = np.clip(q - step[:, 1], *Q_BOUNDS)
+        if np.max(np.abs(step)) < tol:
+            break
+
+    return np.stack([s, q], axis=1)
+
+
+def bootstrap_fits(counts, estimate, model='zipf', n_boot=200, seed=None):  # (n_boot, 2) array of refitted (s, q)
+    rng = np.random.default_rng(seed)
+    ranks = np.arange(1, counts.size + 1, dtype=float)
+    probabilities = counts / counts.sum()
+    batch = max(1, BATCH_ELEMENTS // counts.size)
+
+    fits = np.empty((n_boot, 2))
+    for start in range(0, n_boot, batch):
+        size = min(batch, n_boot - start)
+        # types keep their original rank; re-ranking each resample reshuffles the singleton tail and biases the refit
+        samples = rng.multinomial(counts.sum(), probabilities, size=size)
+        fits[start:start + size] = newton_fit(samples.astype(float), ranks, estimate, model)
+    return fits
+
+
+def ks_statistic(counts, pmf):  # largest gap between the empirical and fitted rank CDFs
+    empirical = np.cumsum(counts) / counts.sum()
+    return float(np.max(np.abs(empirical - np.cumsum(pmf))))
+
+
+def zipf_report(counts, n_boot=200, confidence=0.95, seed=None):  # fit, bootstrap intervals and goodness of fit for every model
+    counts = -np.sort(-np.asarray(counts, dtype=np.int64))
+    ranks = np.arange(1, counts.size + 1, dtype=float)
+    n = int(counts.sum())
+    percentiles = [50 * (1 - confidence), 50 * (1 + confidence)]
+
+    report = {'tokens': n, 'types': int(counts.size), 'bootstrap_samples': n_boot, 'confidence': confidence,
+              'models': {}}
+    start = None
+    for model in MODELS:
+        estimate = fit_point(counts, model, start)
+        start = estimate
+        if n_boot:
+            fits = bootstrap_fits(counts, estimate, model, n_boot, seed)
+            s_ci, q_ci = np.percentile(fits, percentiles, axis=0).T.tolist()
+        else:
+            s_ci = q_ci = None
+
+        value, _, _ = likelihood_terms(counts[None, :].astype(float), ranks, estimate[:1], estimate[1:])
+        log_likelihood = -n * float(value[0])
+        parameters = 1 if model == 'zipf' else 2
+        report['models'][model] = {
+            's': float(estimate[0]),
+            's_ci': s_ci,
+            'q': float(estimate[1]),
+            'q_ci': q_ci if model != 'zipf' else None,
+            'log_likelihood': log_likelihood,
+            'aic': 2 * parameters - 2 * log_likelihood,
+            'ks': ks_statistic(counts, zipf_mandelbrot_pmf(ranks, estimate[0], estimate[1])),
+        }
+    return report
@@ -0,0 +1,102 @@
+import numpy as np
+from collections import namedtuple
+from solvers import STEPPERS
+from stability import classify_matrices
+
+# system(t, [x, y]) as written for solve_ivp, evaluated on whole arrays of points (elementwise operations only)
+
+Equilibria = namedtuple('Equilibria', ['points', 'jacobians', 'eigenvalues', 'behavior'])
+
+
+def vector_field(system, points, t=0.0):  # (N, n) points -> (N, n) derivatives
+    return np.stack(np.broadcast_arrays(*system(t, points.T)), axis=-1).astype(float)
+
+
+def jacobians(system, points, eps=1e-6):  # central differences, (N, n) points -> (N, n, n)
+    n = points.shape[1]
+    steps = eps * np.maximum(np.abs(points), 1.0)
+    result = np.empty((len(points), n, n))
+    for j in range(n):  # one pass per state variable, not per point
+        shift = np.zeros_like(points)
+        shift[:, j] = steps[:, j]
+        result[:, :, j] = (vector_field(system, points + shift) - vector_field(system, points - shift)) \
+                          / (2 * steps[:, j, None])
+    return result
+
+
+def nullclines(system, bounds, resolution=400):  # X, Y and the two field components for plt.contour(..., levels=[0])
+    (x_min, x_max), (y_min, y_max) = bounds
+    X, Y = np.meshgrid(np.linspace(x_min, x_max, resolution), np.linspace(y_min, y_max, resolution))
+    U, V = system(0.0, [X, Y])
+    return X, Y, U, V
+
+
+# Newton's method from a whole grid over bounds at once; distinct fixed points, classified
+def find_equilibria(system, bounds, grid_size=20, steps=50, tol=1e-10):
+    axes = [np.linspace(low, high, grid_size) for low, high in bounds]
+    points = np.stack([axis.ravel() for axis in np.meshgrid(*axes)], axis=1)
+    n = points.shape[1]
+    converged = np.zeros(len(points), dtype=bool)
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        # tol is relative to the largest |f| on the starting grid, so rescaling the system changes nothing
+        field_scale = np.nanmax(np.abs(vector_field(system, points)))
+        field_scale = field_scale if field_scale > 0 else 1.0
+        for _ in range(steps):
+            field = vector_field(system, points)
+            converged = np.all(np.abs(field) <= tol * field_scale, axis=1)
+            if converged.all():
+                break
+            J = jacobians(system, points)
+            invertible = np.abs(np.linalg.det(J)) > 1e-12 * np.abs(J).max(axis=(1, 2)) ** n
+            update = np.zeros_like(points)
+            update[invertible] = np.linalg.solve(J[invertible], field[invertible][..., None])[..., 0]
+            points = np.where(converged[:, None], points, points - update)
+
+        field = vector_field(system, points)
+        converged = np.all(np.abs(field) <= np.sqrt(tol) * field_scale, axis=1)
+
+    low = np.array([b[0] for b in bounds])
+    high = np.array([b[1] for b in bounds])
+    span = np.maximum(high - low, 1.0)
+    inside = np.all((points >= low - 1e-9 * span) & (points <= high + 1e-9 * span), axis=1)
+    points = points[converged & inside]
+
+    # Seeds that landed on the same fixed point agree to far better than 1e-6 of the box size
+    keys = np.round(points / (1e-6 * span)).astype(np.int64)
+    _, first = np.unique(keys, axis=0, return_index=True)
+    points = points[first]
+
+    J = jacobians(system, points) if len(points) else np.empty((0, n, n))
+    # relative to each Jacobian's largest entry, well above the central-difference error
+    classification = classify_matrices(J, tol=1e-6) if len(points) else None
+    eigenvalues = classification.eigenvalues if classification else np.empty((0, n), dtype=complex)
+    behavior = classification.behavior if classification else np.empty(0, dtype=str)
+    return Equilibria(points, J, eigenvalues, behavior)
+
+
+# Attractor index each grid point settles at (-1 for none); settled points leave the batch
+def basins_of_attraction(system, attractors, bounds, resolution=1000, t_max=50, h=0.05, method='rk4', tol=1e-3,
+                         check_every=10):
+    (x_min, x_max), (y_min, y_max) = bounds
+    X, Y = np.meshgrid(np.linspace(x_min, x_max, resolution), np.linspace(y_min, y_max, resolution))
+    attractors = np.asarray(attractors, dtype=float).reshape(-1, 2)
+    rhs = lambda t, state: vector_field(system, state, t)
+    step = STEPPERS[method]
+
+    state = np.stack([X.ravel(), Y.ravel()], axis=1)
+    remaining = np.arange(len(state))
+    labels = np.full(len(state), -1)
+    with np.errstate(over='ignore', invalid='ignore'):
+        for n in range(int(np.ceil(t_max / h))):
+            if n % check_every == 0:
+                distances = np.linalg.norm(state[:, None, :] - attractors[None, :, :], axis=2)
+                closest = np.argmin(distances, axis=1)
+                settled = distances[np.arange(len(state)), closest] <= tol
+                labels[remaining[settled]] = closest[settled]
+                state, remaining = state[~settled], remaining[~settled]
+                if not len(state):
+                    break
+            state = step(rhs, n * h, state, h)
+
+    return X, Y, labels.reshape(X.shape)
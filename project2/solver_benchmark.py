@@ -0,0 +1,78 @@
+import time
+import numpy as np
+from solvers import energy_drift, integrate
+from task2 import energy1, energy2, f1, f2, f3, f4, phase_field
+
+# Steps and wall time each method needs to match a tight-tolerance RK45 reference on the task2 systems
+
+systems = {
+    "x'' + x = 0": f1,
+    "x'' + sin(x) = 0": f2,
+    "x'' = -x + x^3": f3,
+    "x'' = x - x^3": f4,
+}
+
+conservative_systems = {
+    "x'' + x = 0": (f1, energy1),
+    "x'' + sin(x) = 0": (f2, energy2),
+}
+
+initial_conditions = [
+    (0.5, 0), (0.2, 0.5), (0.3, 0.1), (0.1, 0.3),
+    (0.4, 0.2), (0.6, 0.1), (0.1, 0.6), (0.7, 0.3),
+    (0.3, 0.4), (0.2, 0.2), (0.5, 0.5),
+]
+
+
+def final_error(rhs, method, t_max, h, rtol=1e-6):
+    start = time.perf_counter()
+    t_values, trajectories, lengths = integrate(rhs, initial_conditions, t_max, h, method=method, rtol=rtol,
+                                                atol=rtol * 1e-3)
+    elapsed = time.perf_counter() - start
+
+    t_end = t_values[-1]
+    _, reference, _ = integrate(rhs, initial_conditions, t_end, 1e-3, method='rk45', rtol=1e-13, atol=1e-15)
+    if np.any(lengths < len(t_values)):
+        return np.inf, len(t_values) - 1, elapsed
+    return np.max(np.abs(trajectories[-1] - reference[-1])), len(t_values) - 1, elapsed
+
+
+def benchmark(target_error=1e-4, t_max=10, min_h=1e-4):
+    for name, f in systems.items():
+        rhs = phase_field(f)
+        print(f"System {name}, target error {target_error:g}:")
+        for method in ('euler', 'midpoint', 'rk4'):
+            h = 0.1
+            error, steps, elapsed = final_error(rhs, method, t_max, h)
+            while error > target_error and h / 2 >= min_h:
+                h /= 2
+                error, steps, elapsed = final_error(rhs, method, t_max, h)
+            reached = '' if error <= target_error else ' (target not reached)'
+            print(f"  {method:9s} h={h:<10.3g} steps={steps:<8d} error={error:.2e} time={elapsed:.3f} s{reached}")
+
+        rtol = 1e-3
+        error, steps, elapsed = final_error(rhs, 'rk45', t_max, 0.01, rtol)
+        while error > target_error and rtol > 1e-12:
+            rtol /= 10
+            error, steps, elapsed = final_error(rhs, 'rk45', t_max, 0.01, rtol)
+        print(f"  {'rk45':9s} rtol={rtol:<7.0e} steps={steps:<8d} error={error:.2e} time={elapsed:.3f} s")
+        print()
+
+
+def energy_benchmark(h=0.1, horizons=(10, 1000)):  # worst relative energy drift over short and 100x longer runs
+    for name, (f, energy) in conservative_systems.items():
+        rhs = phase_field(f)
+        print(f"System {name}, h={h:g}:")
+        for method in ('midpoint', 'rk4', 'leapfrog', 'yoshida4'):
+            results = []
+            for t_max in horizons:
+                start = time.perf_counter()
+                drift = energy_drift(rhs, energy, initial_conditions, t_max, h, method)
+                results.append(f"t={t_max:<6g} drift={np.max(drift):.2e} time={time.perf_counter() - start:.3f} s")
+            print(f"  {method:9s} " + "   ".join(results))
+        print()
+
+
+if __name__ == '__main__':
+    benchmark()
+    energy_benchmark()
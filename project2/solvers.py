@@ -0,0 +1,202 @@
+import numpy as np
+from scipy.linalg import expm
+
+
+# All steppers advance a whole (N_conditions, state) array at once.
+# rhs(t, state) has to return dstate/dt with the same shape as state.
+
+def euler_step(rhs, t, state, h):
+    return state + h * rhs(t, state)
+
+
+def midpoint_step(rhs, t, state, h):
+    k1 = rhs(t, state)
+    return state + h * rhs(t + 0.5 * h, state + 0.5 * h * k1)
+
+
+def rk4_step(rhs, t, state, h):
+    k1 = rhs(t, state)
+    k2 = rhs(t + 0.5 * h, state + 0.5 * h * k1)
+    k3 = rhs(t + 0.5 * h, state + 0.5 * h * k2)
+    k4 = rhs(t + h, state + h * k3)
+    return state + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+# Symplectic steppers: state (q, p) in two column halves, with dq/dt depending on p only and dp/dt on q only
+def leapfrog_step(rhs, t, state, h):  # velocity Verlet: half kick, drift, half kick
+    half = state.shape[1] // 2
+    p = state[:, half:] + 0.5 * h * rhs(t, state)[:, half:]
+    kicked = np.concatenate([state[:, :half], p], axis=1)
+    q = state[:, :half] + h * rhs(t, kicked)[:, :half]
+    drifted = np.concatenate([q, p], axis=1)
+    return np.concatenate([q, p + 0.5 * h * rhs(t + h, drifted)[:, half:]], axis=1)
+
+
+YOSHIDA_W1 = 1 / (2 - 2 ** (1 / 3))
+YOSHIDA_W0 = 1 - 2 * YOSHIDA_W1
+
+
+def yoshida4_step(rhs, t, state, h):  # fourth order: three leapfrog substeps, the middle one backwards
+    state = leapfrog_step(rhs, t, state, YOSHIDA_W1 * h)
+    state = leapfrog_step(rhs, t + YOSHIDA_W1 * h, state, YOSHIDA_W0 * h)
+    return leapfrog_step(rhs, t + (YOSHIDA_W1 + YOSHIDA_W0) * h, state, YOSHIDA_W1 * h)
+
+
+STEPPERS = {'euler': euler_step, 'midpoint': midpoint_step, 'rk4': rk4_step, 'leapfrog': leapfrog_step,
+            'verlet': leapfrog_step, 'yoshida4': yoshida4_step}
+METHODS = tuple(STEPPERS) + ('rk45',)
+
+# Dormand-Prince 5(4) tableau
+RK45_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+RK45_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+RK45_B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+RK45_E = RK45_B - np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
+
+
+# Yields (t, state) one step at a time from t = 0, storing nothing; t_max=None never stops
+def iter_trajectory(rhs, initial_state, h, t_max=None, method='euler'):
+    step = STEPPERS[method]
+    state = np.array(initial_state, dtype=float)
+    n, t = 0, 0.0
+    while t_max is None or t < t_max:
+        yield t, state
+        state = step(rhs, t, state, h)
+        n += 1
+        t = n * h
+
+
+# max_t |E(t) - E(0)| / |E(0)| of every trajectory, streamed
+def energy_drift(rhs, energy, initial_conditions, t_max, h, method='leapfrog'):
+    trajectory = iter_trajectory(rhs, np.array(initial_conditions, dtype=float, ndmin=2), h, t_max, method)
+    _, state = next(trajectory)
+    start = energy(state)
+    scale = np.where(start != 0, np.abs(start), 1.0)
+    drift = np.zeros(len(state))
+    with np.errstate(over='ignore', invalid='ignore'):
+        for _, state in trajectory:
+            np.fmax(drift, np.abs(energy(state) - start) / scale, out=drift)
+    return drift
+
+
+# All initial conditions at once from t = 0; escaped trajectories stay NaN from then on
+def integrate(rhs, initial_conditions, t_max, h, method='midpoint', escape=1e2, record_every=1, rtol=1e-6, atol=1e-9):
+    if method == 'rk45':
+        return integrate_adaptive(rhs, initial_conditions, t_max, h, escape, record_every, rtol, atol)
+    step = STEPPERS[method]
+
+    t_values = np.arange(0, t_max, h)
+    state = np.array(initial_conditions, dtype=float, ndmin=2)
+
+    recorded_times = t_values[::record_every]
+    trajectories = np.full((len(recorded_times),) + state.shape, np.nan)
+    trajectories[0] = state
+    lengths = np.full(len(state), len(recorded_times))
+    active = np.ones(len(state), dtype=bool)
+
+    for n in range(1, len(t_values)):
+        next_state = step(rhs, t_values[n - 1], state, h)
+        if escape is not None:
+            escaped = active & np.any(np.abs(next_state) > escape, axis=1)
+            if escaped.any():
+                lengths[escaped] = -(-n // record_every)
+                active &= ~escaped
+                if not active.any():
+                    break
+            if not active.all():
+                next_state[~active] = state[~active]
+        state = next_state
+
+        if n % record_every == 0:
+            row = n // record_every
+            if active.all():
+                trajectories[row] = state
+            else:
+                trajectories[row, active] = state[active]
+
+    return recorded_times, trajectories, lengths
+
+
+# Dormand-Prince with one step size for the whole batch, so all rows share a time grid
+def integrate_adaptive(rhs, initial_conditions, t_max, h, escape=1e2, record_every=1, rtol=1e-6, atol=1e-9,
+                       max_steps=10 ** 6):
+    state = np.array(initial_conditions, dtype=float, ndmin=2)
+    times = np.empty(64)
+    trajectories = np.full((64,) + state.shape, np.nan)
+    times[0], trajectories[0] = 0.0, state
+    lengths = np.zeros(len(state), dtype=int)
+    active = np.ones(len(state), dtype=bool)
+
+    t, row, accepted = 0.0, 1, 0
+    k = [None] * 7
+    k[0] = rhs(t, state)
+    while t < t_max and accepted < max_steps:
+        last = h >= t_max - t
+        if last:
+            h = t_max - t
+        with np.errstate(over='ignore', invalid='ignore'):  # a step too long for a fast trajectory is rejected below
+            for i in range(1, 7):
+                k[i] = rhs(t + RK45_C[i] * h, state + h * sum(a * k[j] for j, a in enumerate(RK45_A[i]) if a))
+            next_state = state + h * sum(b * k[i] for i, b in enumerate(RK45_B) if b)
+            error = h * sum(e * k[i] for i, e in enumerate(RK45_E) if e)
+
+            scale = atol + rtol * np.maximum(np.abs(state), np.abs(next_state))
+            norms = np.sqrt(np.mean((error / scale) ** 2, axis=1))
+        worst = np.max(norms[active]) if np.isfinite(norms[active]).all() else np.inf
+        if worst > 1:
+            h *= max(0.2, 0.9 * worst ** -0.2) if np.isfinite(worst) else 0.2
+            continue
+
+        t = t_max if last else t + h
+        accepted += 1
+        h *= min(5.0, 0.9 * worst ** -0.2) if worst > 0 else 5.0
+        k[0] = k[6]  # first same as last
+        if escape is not None:
+            escaped = active & np.any(np.abs(next_state) > escape, axis=1)
+            if escaped.any():
+                lengths[escaped] = row
+                active &= ~escaped
+                if not active.any():
+                    break
+                next_state[~active] = state[~active]
+                k[0] = rhs(t, next_state)
+            elif not active.all():
+                next_state[~active] = state[~active]
+        state = next_state
+
+        if accepted % record_every == 0 or t >= t_max:
+            if row == len(times):
+                times = np.concatenate([times, np.empty(row)])
+                trajectories = np.concatenate([trajectories, np.full(trajectories.shape, np.nan)])
+            times[row] = t
+            trajectories[row, active] = state[active]
+            row += 1
+
+    lengths[active] = row
+    return times[:row], trajectories[:row], lengths
+
+
+# Exact x(t) = expm(A t) x0 on integrate()'s grid, with the same outputs
+def integrate_linear(A, initial_conditions, t_max, h, escape=1e2, record_every=1):
+    t_values = np.arange(0, t_max, h)[::record_every]
+    state = np.array(initial_conditions, dtype=float, ndmin=2)
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        propagators = expm(t_values[:, None, None] * np.asarray(A, dtype=float))
+        trajectories = np.einsum('tij,nj->tni', propagators, state)
+
+    lengths = np.full(len(state), len(t_values))
+    if escape is not None:
+        with np.errstate(invalid='ignore'):
+            outside = np.logical_or.accumulate(~np.all(np.abs(trajectories) <= escape, axis=2), axis=0)
+        trajectories[outside] = np.nan
+        escaped = outside[-1]
+        lengths[escaped] = np.argmax(outside[:, escaped], axis=0)
+    return t_values, trajectories, lengths
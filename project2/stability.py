@@ -0,0 +1,74 @@
+import numpy as np
+from collections import namedtuple
+
+Classification = namedtuple('Classification', ['eigenvalues', 'trace', 'determinant', 'behavior'])
+
+
+def with_stability(stable, kind):
+    return np.where(stable, 'Stable ' + kind, 'Unstable ' + kind)
+
+
+# (M, n, n) or (n, n) -> eigenvalues, trace, determinant, label; tol is relative to each matrix
+def classify_matrices(matrices, tol=1e-9):
+    A = np.asarray(matrices, dtype=float)
+    single = A.ndim == 2
+    A = A[None] if single else A
+    n = A.shape[-1]
+
+    trace = np.trace(A, axis1=-2, axis2=-1)
+    if n == 2:
+        determinant = A[:, 0, 0] * A[:, 1, 1] - A[:, 0, 1] * A[:, 1, 0]
+    else:
+        determinant = np.linalg.det(A)
+    scale = np.abs(A).max(axis=(-2, -1))
+    zero = scale == 0  # every point is a fixed point of x' = 0
+
+    if n == 2:
+        discriminant = trace ** 2 - 4 * determinant
+        root = np.sqrt(discriminant.astype(complex))
+        eigenvalues = np.stack([(trace + root) / 2, (trace - root) / 2], axis=-1)
+
+        tol_det = tol * scale ** 2
+        repeated = np.abs(discriminant) <= tol_det
+        scalar = (np.abs(A[:, 0, 1]) <= tol * scale) & (np.abs(A[:, 1, 0]) <= tol * scale) & \
+                 (np.abs(A[:, 0, 0] - A[:, 1, 1]) <= tol * scale)
+        stable = trace < 0
+        behavior = np.select(
+            [zero,
+             np.abs(determinant) <= tol_det,
+             determinant < 0,
+             np.abs(trace) <= tol * scale,
+             discriminant < -tol_det,
+             repeated & scalar,
+             repeated],
+            ['Non-isolated',
+             'Non-isolated',
+             'Saddle Point',
+             'Center',
+             with_stability(stable, 'Spiral'),
+             with_stability(stable, 'Star'),
+             with_stability(stable, 'Degenerate Node')],
+            with_stability(stable, 'Node'))
+    else:
+        eigenvalues = np.linalg.eigvals(A).astype(complex)
+        limit = tol * scale[:, None]
+        positive = np.any(eigenvalues.real > limit, axis=1)
+        negative = np.any(eigenvalues.real < -limit, axis=1)
+        imaginary_axis = np.any(np.abs(eigenvalues.real) <= limit, axis=1)
+        oscillating = np.any(np.abs(eigenvalues.imag) > limit, axis=1)
+        behavior = np.select(
+            [zero | np.any(np.abs(eigenvalues) <= limit, axis=1),
+             positive & negative,
+             imaginary_axis & ~positive & ~negative,
+             imaginary_axis,
+             oscillating],
+            ['Non-isolated',
+             'Saddle Point',
+             'Center',
+             'Non-hyperbolic',
+             with_stability(negative, 'Spiral')],
+            with_stability(negative, 'Node'))
+
+    if single:
+        return Classification(eigenvalues[0], trace[0], determinant[0], str(behavior[0]))
+    return Classification(eigenvalues, trace, determinant, behavior)
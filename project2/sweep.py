@@ -0,0 +1,159 @@
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import matplotlib.pyplot as plt
+from solvers import STEPPERS
+
+# rhs(t, state, params) gets one params row per state row; module-level so the pool can pickle it
+
+SWEEP_FIELDS = ('params', 'initial', 'final', 'minimum', 'maximum', 'mean', 'samples', 'escaped')
+SweepResult = namedtuple('SweepResult', SWEEP_FIELDS)
+
+
+# x' = x (a - x - b y), y' = y (c - x - d y); task4's system is (a, b, c, d) = (3, 2, 2, 1)
+def competition(t, state, params):
+    x, y = state[:, 0], state[:, 1]
+    a, b, c, d = params.T
+    return np.stack([x * (a - x - b * y), y * (c - x - d * y)], axis=1)
+
+
+# x'' = a x - b x^3 - c x'; task2's f3 and f4 are (a, b, c) = (-1, -1, 0) and (1, 1, 0)
+def duffing(t, state, params):
+    x, y = state[:, 0], state[:, 1]
+    a, b, c = params.T
+    return np.stack([y, a * x - b * x ** 3 - c * y], axis=1)
+
+
+def parameter_grid(*values):  # cartesian product of the per-parameter value lists, (M, P)
+    return np.stack([axis.ravel() for axis in np.meshgrid(*map(np.atleast_1d, values), indexing='ij')], axis=1)
+
+
+# Min, max, mean, final state and `samples` states after t = transient; escaped rows are NaN
+def sweep_chunk(rhs, params, initial, t_max, h, transient, samples, method, escape):
+    step = STEPPERS[method]
+    f = lambda t, state: rhs(t, state, params)
+    n_steps = int(np.ceil(t_max / h))
+    first = min(int(np.ceil(transient / h)), n_steps)
+    every = max(1, (n_steps - first) // max(samples, 1))
+
+    state = np.array(initial, dtype=float)
+    minimum = np.full(state.shape, np.inf)
+    maximum = np.full(state.shape, -np.inf)
+    total = np.zeros(state.shape)
+    recorded = np.full((len(state), samples, state.shape[1]), np.nan)
+    escaped = np.zeros(len(state), dtype=bool)
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        for n in range(n_steps + 1):
+            if n >= first:
+                np.minimum(minimum, state, out=minimum)
+                np.maximum(maximum, state, out=maximum)
+                total += state
+                k = samples - 1 - (n_steps - n) // every  # counted back from the last step, which is always sampled
+                if (n_steps - n) % every == 0 and k >= 0:
+                    recorded[:, k] = state
+            if n == n_steps:
+                break
+            next_state = step(f, n * h, state, h)
+            if escape is not None:
+                out = ~escaped & ~np.all(np.abs(next_state) <= escape, axis=1)
+                escaped |= out
+                next_state[escaped] = state[escaped]  # frozen rows stay finite
+            state = next_state
+
+    mean = total / (n_steps + 1 - first)
+    for array in (state, minimum, maximum, mean, recorded):
+        array[escaped] = np.nan
+    return state, minimum, maximum, mean, recorded, escaped
+
+
+# Every (params row, initial condition) pair, parameter-major, in chunks across a pool; saved under output_dir
+def sweep(rhs, params, initial_conditions, t_max, h, transient=None, samples=100, method='rk4', escape=1e2,
+          output_dir=None, chunk_size=1 << 14, workers=None):
+    params = np.array(params, dtype=float, ndmin=2)
+    initial_conditions = np.array(initial_conditions, dtype=float, ndmin=2)
+    transient = t_max / 2 if transient is None else transient
+    m, n_initial, d = len(params), len(initial_conditions), initial_conditions.shape[1]
+    total = m * n_initial
+    shapes = {
+        'params': (total, params.shape[1]), 'initial': (total, d), 'final': (total, d), 'minimum': (total, d),
+        'maximum': (total, d), 'mean': (total, d), 'samples': (total, samples, d), 'escaped': (total,),
+    }
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        arrays = {name: np.lib.format.open_memmap(os.path.join(output_dir, name + '.npy'), mode='w+',
+                                                  dtype=bool if name == 'escaped' else float, shape=shape)
+                  for name, shape in shapes.items()}
+    else:
+        arrays = {name: np.empty(shape, dtype=bool if name == 'escaped' else float) for name, shape in shapes.items()}
+
+    def chunks():  # built lazily so the full combination table never exists at once
+        for start in range(0, total, chunk_size):
+            rows = np.arange(start, min(start + chunk_size, total))
+            yield params[rows // n_initial], initial_conditions[rows % n_initial]
+
+    run = partial(sweep_chunk, rhs, t_max=t_max, h=h, transient=transient, samples=samples, method=method,
+                  escape=escape)
+    start = 0
+
+    def store(chunk_params, chunk_initial, result):
+        nonlocal start
+        stop = start + len(chunk_params)
+        arrays['params'][start:stop] = chunk_params
+        arrays['initial'][start:stop] = chunk_initial
+        for name, values in zip(SWEEP_FIELDS[2:], result):
+            arrays[name][start:stop] = values
+        start = stop
+
+    if workers == 1 or total <= chunk_size:
+        for chunk in chunks():
+            store(*chunk, run(*chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+            limit = 2 * (workers or os.cpu_count() or 1)  # enough queued work to keep every worker busy
+            for chunk in chunks():
+                in_flight.append((chunk, pool.submit(run, *chunk)))
+                if len(in_flight) >= limit:
+                    chunk, future = in_flight.popleft()
+                    store(*chunk, future.result())
+            while in_flight:
+                chunk, future = in_flight.popleft()
+                store(*chunk, future.result())
+
+    if output_dir is None:
+        return SweepResult(**arrays)
+    for array in arrays.values():
+        array.flush()
+    return load_sweep(output_dir)
+
+
+def load_sweep(output_dir):  # memory-mapped, so plotting a slice of a huge sweep only reads that slice
+    return SweepResult(*(np.load(os.path.join(output_dir, name + '.npy'), mmap_mode='r') for name in SWEEP_FIELDS))
+
+
+def plot_bifurcation(result, parameter=0, component=0, xlabel='parameter', ylabel='x', title=None):
+    values = np.repeat(result.params[:, parameter], result.samples.shape[1])
+    points = result.samples[:, :, component].ravel()
+    plt.figure(figsize=(10, 6))
+    plt.plot(values, points, ',', color='black', alpha=0.5)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.title(title)
+    plt.grid(True)
+    plt.show()
+
+
+if __name__ == '__main__':
+    # task4's competition model with the competition strength b of species y on x swept: below
+    # b = 1.5 x always wins, above it a coexistence saddle appears and the winner depends on the start
+    b_values = np.linspace(0.5, 3, 500)
+    params = parameter_grid(3, b_values, 2, 1)
+    initial = np.stack(np.meshgrid(np.linspace(0.1, 3, 10), np.linspace(0.1, 3, 10)), axis=-1).reshape(-1, 2)
+    result = sweep(competition, params, initial, t_max=40, h=0.05, samples=1,
+                   output_dir=os.path.join('output', 'sweep_competition'))
+    plot_bifurcation(result, parameter=1, xlabel='b', ylabel='final x',
+                     title="Final x of x' = x(3 - x - b y), y' = y(2 - x - y)")
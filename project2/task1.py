@@ -1,6 +1,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
+from solvers import iter_trajectory
 
 def f(x):
     return x * (x - 1) * (x - 2)
@@ -17,12 +18,6 @@ plt.legend()
 plt.grid(True)
 plt.show()
 
-def euler_method(x0, y, h, x):
-    while x0 < x:
-        y = y + h * f(y)
-        x0 = x0 + h
-    return y
-
 fixed_points = [0, 1, 2]
 
 # Initial conditions to observe the behavior of ( x(t) ) near the fixed points
@@ -36,11 +31,7 @@ fig = go.Figure()
 
 for dt in time_steps:
     for x0 in initial_conditions:
-        t_values = np.arange(0, t_max, dt)
-        x_values = [x0]
-        for t in t_values[1:]:
-            x_new = euler_method(t - dt, x_values[-1], dt, t)
-            x_values.append(x_new)
+        t_values, x_values = map(np.array, zip(*iter_trajectory(lambda t, x: f(x), x0, dt, t_max)))
         fig.add_trace(go.Scatter(x=t_values, y=x_values, mode='lines', name=f'x0 = {x0}, dt = {dt}'))
 
 for fp in fixed_points:
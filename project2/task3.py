@@ -1,6 +1,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from numpy.linalg import eig, det
+from stability import classify_matrices
+from solvers import integrate, integrate_linear
 
 # Define matrices
 matrices = {
@@ -11,7 +12,7 @@ matrices = {
 }
 
 
-def plot_phase_portrait(A, title, t_max=10, dt=0.01, grid_size=6):
+def plot_phase_portrait(system, title, t_max=10, dt=0.01, grid_size=6, method='euler'):
     # Set up a grid of initial conditions
     x_vals = np.linspace(-5, 5, grid_size)
     y_vals = np.linspace(-5, 5, grid_size)
@@ -27,18 +28,14 @@ def plot_phase_portrait(A, title, t_max=10, dt=0.01, grid_size=6):
     plt.axhline(0, color='black', linewidth=0.5)
     plt.axvline(0, color='black', linewidth=0.5)
 
-    # For each initial condition, compute the trajectory
-    for (x0, y0) in initial_conditions:
-        trajectory = []
-        x = np.array([x0, y0])
-        for _ in np.arange(0, t_max, dt):
-            if np.any(np.abs(x) > max_val):
-                break
-            trajectory.append(x)
-            x = x + dt * A @ x  # Euler method: x_{n+1} = x_n + dt * (A @ x_n)
-
-        # Convert trajectory to x1 and x2 for plotting
-        trajectory = np.array(trajectory)
+    if callable(system):
+        # Nonlinear system(t, [x, y]) like the ones in task4, integrated numerically for all starting points
+        rhs = lambda t, state: np.stack(system(t, state.T), axis=1)
+        _, trajectories, _ = integrate(rhs, initial_conditions, t_max, dt, method=method, escape=max_val)
+    else:
+        # Linear system x' = A x, exact solution x(t) = expm(A t) x0
+        _, trajectories, _ = integrate_linear(system, initial_conditions, t_max, dt, escape=max_val)
+    for trajectory in trajectories.transpose(1, 0, 2):
         plt.plot(trajectory[:, 0], trajectory[:, 1], 'b-', linewidth=0.5)
 
     plt.grid()
@@ -46,20 +43,8 @@ def plot_phase_portrait(A, title, t_max=10, dt=0.01, grid_size=6):
 
 
 def analyze_matrix(A, label):
-    trace_A = np.trace(A)
-    det_A = det(A)
-
-    eigenvalues = eig(A)[0]
-
-    # Classify based on trace and determinant
-    if det_A < 0:
-        behavior = "Saddle Point"
-    elif trace_A ** 2 > 4 * det_A:
-        behavior = "Node"
-    elif trace_A ** 2 < 4 * det_A:
-        behavior = "Spiral"
-    else:
-        behavior = "Center"
+    # Classify from trace, determinant and eigenvalues (classify_matrices also takes stacks of matrices)
+    eigenvalues, trace_A, det_A, behavior = classify_matrices(A)
 
     # Print analysis
     print(f"Matrix {label}:")
@@ -68,6 +53,7 @@ def analyze_matrix(A, label):
     print(f"Eigenvalues: {eigenvalues}")
     print(f"Behavior: {behavior}")
     print()
+    return behavior
 
 
 # Run analysis and plot for each matrix
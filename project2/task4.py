@@ -1,6 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.integrate import solve_ivp
+from equilibria import find_equilibria, nullclines, basins_of_attraction
 
 # Define the original nonlinear system
 def system(t, variables):
@@ -16,6 +16,33 @@ def modified_system(t, variables):
     dydt = y * (3 - x - y)  # Modify the equation for dy/dt
     return [dxdt, dydt]
 
+bounds = ((0, 3), (0, 3))
+
+
+def describe_equilibria(name, equilibria):
+    print(f"{name}:")
+    isolated = equilibria.behavior != 'Non-isolated'
+    for point, eigenvalues, behavior in zip(equilibria.points[isolated], equilibria.eigenvalues[isolated],
+                                            equilibria.behavior[isolated]):
+        print(f"  ({point[0]:.4f}, {point[1]:.4f})  eigenvalues {np.round(eigenvalues, 4)}  {behavior}")
+    if not isolated.all():
+        print(f"  {np.count_nonzero(~isolated)} non-isolated fixed points found (a line of equilibria)")
+
+
+def draw_nullclines_and_equilibria(system, equilibria):
+    NX, NY, NU, NV = nullclines(system, bounds)
+    plt.contour(NX, NY, NU, levels=[0], colors="red", linewidths=1)
+    plt.contour(NX, NY, NV, levels=[0], colors="blue", linewidths=1)
+    stable = np.char.startswith(equilibria.behavior.astype(str), 'Stable')
+    plt.scatter(*equilibria.points[stable].T, color="black", zorder=3)
+    plt.scatter(*equilibria.points[~stable].T, facecolors="white", edgecolors="black", zorder=3)
+
+
+equilibria = find_equilibria(system, bounds)
+modified_equilibria = find_equilibria(modified_system, bounds)
+describe_equilibria("Original system", equilibria)
+describe_equilibria("Modified system", modified_equilibria)
+
 # Define the initial conditions
 x_values = np.linspace(0, 3, 20)
 y_values = np.linspace(0, 3, 20)
@@ -29,6 +56,7 @@ V = Y * (2 - X - Y)
 plt.figure(figsize=(10, 5))
 plt.subplot(1, 2, 1)
 plt.quiver(X, Y, U, V, color="teal")
+draw_nullclines_and_equilibria(system, equilibria)
 plt.xlabel("x")
 plt.ylabel("y")
 plt.title("Phase Portrait of Original System")
@@ -42,6 +70,7 @@ V_mod = Y * (3 - X - Y)
 # phase portrait for the modified system
 plt.subplot(1, 2, 2)
 plt.quiver(X, Y, U_mod, V_mod, color="orange")
+draw_nullclines_and_equilibria(modified_system, modified_equilibria)
 plt.xlabel("x")
 plt.ylabel("y")
 plt.title("Phase Portrait of Modified System (Stable Nonzero Population)")
@@ -51,3 +80,16 @@ plt.ylim(0, 3)
 
 plt.tight_layout()
 plt.show()
+
+# Basins of attraction of the stable equilibria of the original system (competitive exclusion)
+attractors = equilibria.points[np.char.startswith(equilibria.behavior.astype(str), 'Stable')]
+BX, BY, labels = basins_of_attraction(system, attractors, bounds, resolution=1000)
+plt.figure(figsize=(6, 5))
+plt.pcolormesh(BX, BY, labels, cmap="Pastel1", shading="auto")
+draw_nullclines_and_equilibria(system, equilibria)
+plt.xlabel("x")
+plt.ylabel("y")
+plt.title("Basins of Attraction of the Original System")
+plt.xlim(0, 3)
+plt.ylim(0, 3)
+plt.show()
@@ -0,0 +1,110 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from log_binning import LogBinnedHistogram
+from oslo_kernel import drive, new_pile
+
+# Avalanche sizes of independent Oslo piles after the crossover time t_c, one SeedSequence child per realization
+
+EnsembleResult = namedtuple('EnsembleResult', ['L', 'histogram', 'binned', 'crossover_times', 'moments'])
+
+OSLO_D = 2.25  # avalanche dimension, s_cutoff ~ L^D
+OSLO_TAU = 1.55  # avalanche-size exponent, P(s) ~ s^-tau below the cutoff
+BLOCK = 1 << 16  # grains per kernel call once in the steady state
+
+
+# Yields t_c, then the sizes of the next `grains` avalanches one block at a time
+def steady_state_blocks(L, grains, seed=None, block=BLOCK):
+    pile = new_pile(L, seed)
+    transient_block = max(L * L // 4, 1)
+    driven = 0
+    while True:
+        _, avalanches, crossover = drive(pile, transient_block)
+        if crossover >= 0:
+            break
+        driven += transient_block
+    yield driven + crossover
+
+    steady = avalanches[crossover + 1:][:grains]
+    yield steady
+    remaining = grains - len(steady)
+    while remaining > 0:
+        _, avalanches, _ = drive(pile, min(block, remaining))
+        remaining -= len(avalanches)
+        yield avalanches
+
+
+def realization_histogram(task):  # one pile's steady-state avalanche counts, exact (indexed by size) and log-binned
+    L, grains, seed = task
+    blocks = steady_state_blocks(L, grains, seed)
+    crossover = next(blocks)
+    histogram = np.zeros(0, dtype=np.int64)
+    binned = LogBinnedHistogram()
+    for avalanches in blocks:
+        histogram = merge_histograms([histogram, np.bincount(avalanches)])
+        binned.update_many(avalanches)
+    return L, crossover, histogram, binned
+
+
+def merge_histograms(histograms):
+    merged = np.zeros(max(len(h) for h in histograms), dtype=np.int64)
+    for histogram in histograms:
+        merged[:len(histogram)] += histogram
+    return merged
+
+
+def avalanche_moments(histogram, orders=(1, 2, 3, 4)):  # <s^k> from a size histogram
+    sizes = np.arange(len(histogram), dtype=float)
+    total = histogram.sum()
+    return {k: float(np.dot(sizes ** k, histogram) / total) for k in orders}
+
+
+# {L: EnsembleResult} merged over `realizations` independent piles per L
+def ensemble(system_sizes, realizations=4, grains=10 ** 5, seed=0, workers=None):
+    if grains <= 0 or realizations <= 0:
+        raise ValueError(f"need grains > 0 and realizations > 0, got grains={grains}, realizations={realizations}")
+    children = np.random.SeedSequence(seed).spawn(len(system_sizes) * realizations)
+    tasks = [(L, grains, children[i * realizations + r]) for i, L in enumerate(system_sizes)
+             for r in range(realizations)]
+
+    if workers == 1 or len(tasks) == 1:
+        outcomes = list(map(realization_histogram, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(realization_histogram, tasks))
+
+    results = {}
+    for L in system_sizes:
+        mine = [outcome for outcome in outcomes if outcome[0] == L]
+        histogram = merge_histograms([outcome[2] for outcome in mine])
+        binned = LogBinnedHistogram()
+        for outcome in mine:
+            binned.merge(outcome[3])
+        results[L] = EnsembleResult(L, histogram, binned, np.array([outcome[1] for outcome in mine]),
+                                    avalanche_moments(histogram))
+    return results
+
+
+# s / L^D and s^tau P(s) for s >= 1; one curve for every L with the right exponents
+def data_collapse(result, D=OSLO_D, tau=OSLO_TAU):
+    sizes = np.nonzero(result.histogram)[0]
+    sizes = sizes[sizes > 0]
+    probabilities = result.histogram[sizes] / result.histogram.sum()
+    return sizes / result.L ** D, sizes ** tau * probabilities
+
+
+def moment_exponents(results):  # slope of log <s^k> against log L, which is D (1 + k - tau)
+    system_sizes = sorted(results)
+    log_L = np.log(system_sizes)
+    orders = results[system_sizes[0]].moments
+    return {k: float(np.polyfit(log_L, np.log([results[L].moments[k] for L in system_sizes]), 1)[0])
+            for k in orders}
+
+
+if __name__ == '__main__':
+    results = ensemble([32, 64, 128, 256], realizations=4, grains=10 ** 5)
+    for L, result in results.items():
+        print(f"L={L:4d}  <t_c>={result.crossover_times.mean():9.0f}  t_c/L^2={result.crossover_times.mean() / L ** 2:.3f}"
+              f"  <s>={result.moments[1]:.1f}")
+    for k, exponent in moment_exponents(results).items():
+        print(f"<s^{k}> ~ L^{exponent:.3f}  (D(1 + k - tau) = {OSLO_D * (1 + k - OSLO_TAU):.3f})")
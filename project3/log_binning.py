@@ -0,0 +1,60 @@
+import math
+import numpy as np
+
+
+class LogBinnedHistogram:  # streaming counts of sizes s >= 1 in bins [a^j, a^(j+1)); zero sizes are only counted
+
+    def __init__(self, ratio=1.25):
+        self.ratio = ratio
+        self.log_ratio = math.log(ratio)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.zeros = 0
+        self.total = 0
+
+    def bin_of(self, sizes):
+        # the small offset keeps exact powers of the ratio from falling into the bin below
+        return np.floor(np.log(sizes) / self.log_ratio + 1e-9).astype(np.int64)
+
+    def grow(self, bins):
+        if bins > len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(bins - len(self.counts), dtype=np.int64)])
+
+    def update(self, size):  # one event, O(1) apart from the occasional new bin
+        self.total += 1
+        if size <= 0:
+            self.zeros += 1
+            return
+        j = int(math.floor(math.log(size) / self.log_ratio + 1e-9))
+        self.grow(j + 1)
+        self.counts[j] += 1
+
+    def update_many(self, sizes):  # a block of events at once
+        sizes = np.asarray(sizes)
+        positive = sizes[sizes > 0]
+        self.total += len(sizes)
+        self.zeros += len(sizes) - len(positive)
+        if len(positive):
+            bins = np.bincount(self.bin_of(positive))
+            self.grow(len(bins))
+            self.counts[:len(bins)] += bins
+
+    def merge(self, other):
+        if other.ratio != self.ratio:
+            raise ValueError(f"cannot merge histograms with bin ratios {self.ratio} and {other.ratio}")
+        self.grow(len(other.counts))
+        self.counts[:len(other.counts)] += other.counts
+        self.zeros += other.zeros
+        self.total += other.total
+        return self
+
+    def edges(self):  # integer edges: bin j holds the sizes edges[j] <= s < edges[j + 1]
+        return np.ceil(self.ratio ** np.arange(len(self.counts) + 1) - 1e-9).astype(np.int64)
+
+    def distribution(self):  # (geometric bin centre, P per unit size, Poisson error) of every non-empty bin
+        edges = self.edges()
+        widths = edges[1:] - edges[:-1]
+        filled = (self.counts > 0) & (widths > 0)
+        centres = np.sqrt(edges[:-1] * (edges[1:] - 1.0))[filled]
+        norm = self.total * widths[filled]
+        counts = self.counts[filled]
+        return centres, counts / norm, np.sqrt(counts) / norm
@@ -0,0 +1,144 @@
+import time
+from collections import namedtuple
+import numpy as np
+from scipy.stats import ks_2samp
+
+try:
+    from numba import njit
+    compiled, NUMBA_AVAILABLE = njit(cache=True), True
+except ImportError:
+    compiled, NUMBA_AVAILABLE = (lambda function: function), False
+
+# task1's drive/relax loop compiled; new thresholds come from a buffer of random bits refilled between calls
+
+BIT_BUFFER = 1 << 20
+
+# Indices into the kernel's progress array; CROSSOVER is the first grain of this drive() that left the pile
+GRAIN, BIT, STACK_SIZE, AVALANCHE, CROSSOVER = range(5)
+
+# Everything needed to keep driving the same pile across calls
+Pile = namedtuple('Pile', ['z', 'thresholds', 'stack', 'on_stack', 'progress', 'rng'])
+
+
+@compiled
+def drive_relax(z, thresholds, bits, stack, on_stack, progress, heights, avalanches):
+    L = z.shape[0]
+    T = avalanches.shape[0]
+    grain, bit, size, avalanche = progress[GRAIN], progress[BIT], progress[STACK_SIZE], progress[AVALANCHE]
+    crossover = progress[CROSSOVER]
+    height = 0
+    for i in range(L):
+        height += z[i]
+
+    while grain < T:
+        if size == 0 and avalanche < 0:  # start the next grain
+            z[0] += 1
+            height += 1
+            avalanche = 0
+            stack[0] = 0
+            on_stack[0] = True
+            size = 1
+
+        while size > 0:
+            i = stack[size - 1]
+            if z[i] <= thresholds[i]:
+                size -= 1
+                on_stack[i] = False
+                continue
+            if bit == bits.shape[0]:  # out of random bits: save progress, site i stays on the stack
+                progress[GRAIN], progress[BIT], progress[STACK_SIZE], progress[AVALANCHE] = grain, bit, size, avalanche
+                progress[CROSSOVER] = crossover
+                return False
+
+            avalanche += 1
+            if i == L - 1 and crossover < 0:
+                crossover = grain
+            z[i] -= 2
+            height -= 2
+            thresholds[i] = 1 + bits[bit]
+            bit += 1
+            for j in (i - 1, i + 1):
+                if 0 <= j < L:
+                    z[j] += 1
+                    height += 1
+                    if not on_stack[j]:
+                        stack[size] = j
+                        on_stack[j] = True
+                        size += 1
+
+        heights[grain] = height
+        avalanches[grain] = avalanche
+        avalanche = -1
+        grain += 1
+
+    progress[GRAIN], progress[BIT], progress[STACK_SIZE], progress[AVALANCHE] = grain, bit, size, avalanche
+    progress[CROSSOVER] = crossover
+    return True
+
+
+def random_bits(rng, n=BIT_BUFFER):  # n random 0/1 values, eight per random byte
+    return np.unpackbits(rng.integers(0, 256, size=n // 8, dtype=np.uint8))
+
+
+def new_pile(L, seed=None, initial_thresholds=None):  # empty pile; seed may be an int or a SeedSequence
+    rng = np.random.default_rng(seed)
+    if initial_thresholds is None:
+        thresholds = 1 + rng.integers(0, 2, size=L).astype(np.int64)
+    else:
+        thresholds = np.array(initial_thresholds, dtype=np.int64)
+    return Pile(np.zeros(L, dtype=np.int64), thresholds, np.empty(L, dtype=np.int64), np.zeros(L, dtype=np.bool_),
+                np.zeros(5, dtype=np.int64), rng)
+
+
+# Adds T grains; returns their heights, avalanche sizes and the index of the first outflow (-1 if none)
+def drive(pile, T):
+    heights = np.empty(T, dtype=np.int64)
+    avalanches = np.empty(T, dtype=np.int64)
+    pile.progress[:] = [0, 0, 0, -1, -1]
+    while not drive_relax(pile.z, pile.thresholds, random_bits(pile.rng), pile.stack, pile.on_stack, pile.progress,
+                          heights, avalanches):
+        pile.progress[BIT] = 0
+    return heights, avalanches, int(pile.progress[CROSSOVER])
+
+
+# Same statistics as task1.oslo_model, different toppling order
+def oslo_model_fast(L, T, seed=None, initial_thresholds=None):
+    heights, avalanches, _ = drive(new_pile(L, seed, initial_thresholds), T)
+    return heights, avalanches
+
+
+# KS test of the kernel's avalanche sizes against task1's after the transient
+def compare_engines(L=32, T=20000, seed=0, transient=None):
+    from task1 import oslo_model
+
+    transient = L * L if transient is None else transient
+    np.random.seed(seed)
+    start = time.perf_counter()
+    reference_heights, _, reference = oslo_model(L, T, record=('heights', 'avalanches'))
+    reference_time = time.perf_counter() - start
+
+    drive_relax(np.zeros(1, dtype=np.int64), np.ones(1, dtype=np.int64), np.zeros(1, dtype=np.uint8),
+                np.empty(1, dtype=np.int64), np.zeros(1, dtype=np.bool_), np.array([0, 0, 0, -1, -1], dtype=np.int64),
+                np.empty(1, dtype=np.int64), np.empty(1, dtype=np.int64))  # compile outside the timing
+    start = time.perf_counter()
+    heights, avalanches = oslo_model_fast(L, T, seed + 1)
+    kernel_time = time.perf_counter() - start
+
+    reference = reference[transient:]
+    result = ks_2samp(reference, avalanches[transient:])
+    return {
+        'numba': NUMBA_AVAILABLE,
+        'reference_mean_avalanche': float(reference.mean()),
+        'kernel_mean_avalanche': float(avalanches[transient:].mean()),
+        'reference_mean_height': float(np.mean(reference_heights[transient:])),
+        'kernel_mean_height': float(heights[transient:].mean()),
+        'ks_statistic': float(result.statistic),
+        'ks_pvalue': float(result.pvalue),
+        'reference_time': reference_time,
+        'kernel_time': kernel_time,
+    }
+
+
+if __name__ == '__main__':
+    for key, value in compare_engines().items():
+        print(f"{key:26s} {value}")
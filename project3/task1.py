@@ -1,51 +1,98 @@
 import numpy as np
 import plotly.graph_objects as go
+from ensemble import ensemble
+
+
+def topple(z, thresholds, i):
+    L = len(z)
+    z[i] -= 2
+    if i > 0:
+        z[i - 1] += 1
+    if i < L - 1:
+        z[i + 1] += 1
+    thresholds[i] = np.random.randint(1, 3)  # same draw as np.random.choice([1, 2]), without its overhead
+
+
+def relax_scan(z, thresholds):  # reference: sweep over every site until nothing topples, O(L) per pass
+    avalanche_size = 0
+    while np.any(z > thresholds):
+        for i in range(len(z)):
+            if z[i] > thresholds[i]:
+                avalanche_size += 1
+                topple(z, thresholds, i)
+    return avalanche_size
+
+
+# Same topplings in the same order as relax_scan, visiting only sites that can be unstable
+def relax_event(z, thresholds, start=0):
+    L = len(z)
+    avalanche_size = 0
+    candidates = [start]
+    while candidates:
+        next_pass = []
+        checked = -1
+        for i in candidates:
+            if i <= checked:
+                continue
+            while i < L and z[i] > thresholds[i]:
+                avalanche_size += 1
+                topple(z, thresholds, i)
+                if i > 0:
+                    next_pass.append(i - 1)
+                if z[i] > thresholds[i]:
+                    next_pass.append(i)
+                i += 1
+            checked = i
+        candidates = sorted(set(next_pass))
+    return avalanche_size
+
+
+RELAXERS = {'scan': relax_scan, 'event': relax_event}
+
 
+RECORDS = ('heights', 'slopes', 'avalanches')
 
-def oslo_model(L, T, initial_thresholds=None):
+
+# Returns (heights, slopes, avalanches), None for quantities not in record
+def oslo_model(L, T, initial_thresholds=None, relax='event', record=RECORDS, slope_every=1, slope_file=None):
     z = np.zeros(L, dtype=int)
     thresholds = np.random.choice([1, 2], size=L) if initial_thresholds is None else initial_thresholds
-
-    heights = []
-    slopes = []
-    avalanches = []
+    relax = RELAXERS[relax]
+
+    heights = np.empty(T, dtype=np.int64) if 'heights' in record else None
+    avalanches = np.empty(T, dtype=np.int64) if 'avalanches' in record else None
+    slopes = None
+    if 'slopes' in record:
+        shape = (-(-T // slope_every), L)
+        if slope_file is None:
+            slopes = np.empty(shape, dtype=np.uint8)
+        else:
+            slopes = np.lib.format.open_memmap(slope_file, mode='w+', dtype=np.uint8, shape=shape)
 
     for t in range(T):
         z[0] += 1
-        avalanche_size = 0
+        avalanche_size = relax(z, thresholds)
 
-        while np.any(z > thresholds):
-            for i in range(L):
-                if z[i] > thresholds[i]:
-                    avalanche_size += 1
-                    if i == 0:  # First site
-                        z[i] -= 2
-                        z[i + 1] += 1
-                    elif i == L - 1:  # Last site
-                        z[i] -= 2
-                        z[i - 1] += 1
-                    else:  # Middle sites
-                        z[i] -= 2
-                        z[i - 1] += 1
-                        z[i + 1] += 1
-
-                    thresholds[i] = np.random.choice([1, 2])
-
-        heights.append(np.sum(z))
-        slopes.append(z.copy())
-        avalanches.append(avalanche_size)
+        if heights is not None:
+            heights[t] = np.sum(z)
+        if slopes is not None and t % slope_every == 0:
+            slopes[t // slope_every] = z
+        if avalanches is not None:
+            avalanches[t] = avalanche_size
 
+    if isinstance(slopes, np.memmap):
+        slopes.flush()
     return heights, slopes, avalanches
 
 # Task 2: Scaled Avalanche Sizes
 def plot_scaled_avalanches(L, T):
-    _, _, avalanches = oslo_model(L, T)
-    s_max = max(avalanches)  # Find the largest avalanche size
-    scaled_avalanches = [s / s_max for s in avalanches]  # Scale by the largest avalanche size
+    _, _, avalanches = oslo_model(L, T, record=('avalanches',))
+    s_max = avalanches.max()  # Find the largest avalanche size
+    scaled_avalanches = avalanches / s_max  # Scale by the largest avalanche size
 
     # Plot scaled avalanche sizes over time
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=list(range(len(scaled_avalanches))), y=scaled_avalanches, mode='lines', name=f'L={L}'))
+    fig.add_trace(go.Scatter(x=np.arange(len(scaled_avalanches)), y=scaled_avalanches, mode='lines', name=f'L={L}'))
     fig.update_layout(title='Scaled Avalanche Size vs Time',
                       xaxis_title='Time step (Grain Additions)',
                       yaxis_title='Scaled Avalanche Size',
@@ -55,15 +102,17 @@ def plot_scaled_avalanches(L, T):
 
 
 # Task 3: Avalanche Size Probability
-def plot_avalanche_probability(system_sizes, T):
+def plot_avalanche_probability(system_sizes, T, realizations=1):
     fig = go.Figure()
 
+    # T steady-state grains per realization; the filling transient before t_c is dropped
+    results = ensemble(system_sizes, realizations, T)
     for L in system_sizes:
-        _, _, avalanches = oslo_model(L, T)
-        s_values, counts = np.unique(avalanches, return_counts=True)  # Find unique sizes and their counts
-        probabilities = counts / np.sum(counts)  # Normalize to calculate probabilities
+        # Log-binned P(s) with Poisson error bars: far fewer, less noisy points than one per distinct size
+        s_values, probabilities, errors = results[L].binned.distribution()
 
-        fig.add_trace(go.Scatter(x=s_values, y=probabilities, mode='lines+markers', name=f'L={L}'))
+        fig.add_trace(go.Scatter(x=s_values, y=probabilities, error_y=dict(type='data', array=errors),
+                                 mode='lines+markers', name=f'L={L}'))
 
     fig.update_layout(title='Avalanche Size Probability in Log-Log Scale',
                       xaxis_title='Avalanche Size',
@@ -75,10 +124,11 @@ def plot_avalanche_probability(system_sizes, T):
     fig.show()
 
 
-L = 16
-T = 1000
-plot_scaled_avalanches(L, T)
+if __name__ == '__main__':
+    L = 16
+    T = 1000
+    plot_scaled_avalanches(L, T)
 
-system_sizes = [64, 128, 256]  # Different system sizes for Task 3
-plot_avalanche_probability(system_sizes, T)
+    system_sizes = [64, 128, 256]  # Different system sizes for Task 3
+    plot_avalanche_probability(system_sizes, T)
 
@@ -1,3 +1,6 @@
+import json
+import struct
+import zipfile
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
@@ -14,6 +17,42 @@ def read_percolation_data(file_names):
                 data[L].append((p, p_flow, smax))
     return data
 
+def load_sweep(file_name):  # arrays of a save_sweep file, memory-mapped straight out of the uncompressed .npz
+    arrays = {}
+    with zipfile.ZipFile(file_name) as archive, open(file_name, 'rb') as file:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')]
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(archive.open(info))
+                continue
+            file.seek(info.header_offset)
+            name_length, extra_length = struct.unpack('<HH', file.read(30)[26:30])
+            file.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(file)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(file)
+            if shape == () or dtype.hasobject or dtype.kind == 'U' or 0 in shape:
+                arrays[name] = np.load(archive.open(info))
+            else:
+                arrays[name] = np.memmap(file_name, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    arrays['metadata'] = json.loads(str(arrays['metadata']))
+    return arrays
+
+
+def read_sweep_data(file_names):  # same {L: [(p, p_flow, smax), ...]} as read_percolation_data, from sweep files
+    data = {}
+    for file_name in file_names:
+        sweep = load_sweep(file_name)
+        data[int(sweep['L'])] = list(zip(sweep['p_values'], sweep['p_flow'], sweep['s_max']))
+    return data
+
+
+def sweep_distribution(sweep, k):  # sizes and counts of the k-th p of a loaded sweep
+    start, stop = sweep['dist_offsets'][k], sweep['dist_offsets'][k + 1]
+    return sweep['dist_sizes'][start:stop], sweep['dist_counts'][start:stop]
+
+
 def plot_percolation_data(data):
     # Plot p against p_flow for different L
     plt.figure(figsize=(12, 6))
@@ -41,36 +80,28 @@ def plot_percolation_data(data):
     plt.grid(True)
     plt.show()
 
-# Example usage:
-file_names = ['Ave_L10_T1000.txt', 'Ave_L50_T1000.txt', 'Ave_L100_T1000.txt']
-data = read_percolation_data(file_names)
-plot_percolation_data(data)
-
 def generate_lattice(L, p):
     return np.random.rand(L, L) < p
 
 def burning_algorithm(lattice):
     L = len(lattice)
     label = np.copy(lattice).astype(int)
+    cells = label.ravel()  # flat view, the burning front is kept as flat indices into it
     t = 2
 
     # Label all occupied cells in the top line with the marker t=2
-    for j in range(L):
-        if lattice[0, j] == 1:
-            label[0, j] = t
-
-    while True:
-        burning_cells = np.argwhere(label == t)
-        if not burning_cells.size:
-            break
-
-        for x, y in burning_cells:
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < L and 0 <= ny < L and label[nx, ny] == 1:
-                    label[nx, ny] = t + 1
-
-        if np.any(label[L-1, :] == t + 1):
+    front = np.flatnonzero(lattice[0] == 1)
+    cells[front] = t
+
+    # Each step only looks at the neighbours of the cells that caught fire in the previous one
+    while front.size:
+        rows, cols = np.divmod(front, L)
+        neighbours = np.concatenate([front[rows > 0] - L, front[rows < L - 1] + L,
+                                     front[cols > 0] - 1, front[cols < L - 1] + 1])
+        front = np.unique(neighbours[cells[neighbours] == 1])
+        cells[front] = t + 1
+
+        if front.size and front[-1] >= (L - 1) * L:  # front is sorted, so the last cell is the lowest one
             return label, t
 
         t += 1
@@ -111,9 +142,6 @@ def visualize_configurations(file_name):
         plot_lattice(hk_lattice, f'HK Algorithm for L={L}, p={p}', cmap='tab20')
 
 
-# Example usage:
-visualize_configurations('Ave_L10_T1000.txt')
-
 def read_cluster_distribution(file_name):
     data = np.loadtxt(file_name)
     s = data[:, 0]
@@ -121,14 +149,24 @@ def read_cluster_distribution(file_name):
     return s, n_s
 
 def plot_cluster_distribution(file_names, pc=0.592746):
+    distributions = [(float(file_name.split('_')[1][1:]),) + read_cluster_distribution(file_name)
+                     for file_name in file_names]
+    plot_distributions(distributions, pc)
+
+
+def plot_sweep_distribution(file_name, pc=0.592746):  # the same three panels straight from a sweep file
+    sweep = load_sweep(file_name)
+    distributions = [(p,) + sweep_distribution(sweep, k) for k, p in enumerate(sweep['p_values'])]
+    plot_distributions(distributions, pc)
+
+
+def plot_distributions(distributions, pc):  # distributions: (p, s, n_s) for every p
     plt.figure(figsize=(18, 6))
 
     # Subplot for p < pc
     plt.subplot(1, 3, 1)
-    for file_name in file_names:
-        p = float(file_name.split('_')[1][1:])
+    for p, s, n_s in distributions:
         if p < pc:
-            s, n_s = read_cluster_distribution(file_name)
             plt.loglog(s, n_s, label=f'p={p:.2f}')
     plt.xlabel('Cluster size s')
     plt.ylabel('n(s, p, L)')
@@ -138,10 +176,8 @@ def plot_cluster_distribution(file_names, pc=0.592746):
 
     # Subplot for p = pc
     plt.subplot(1, 3, 2)
-    for file_name in file_names:
-        p = float(file_name.split('_')[1][1:])
+    for p, s, n_s in distributions:
         if p == pc:
-            s, n_s = read_cluster_distribution(file_name)
             plt.loglog(s, n_s, label=f'p={pc:.6f}')
     plt.xlabel('Cluster size s')
     plt.ylabel('n(s, p, L)')
@@ -151,10 +187,8 @@ def plot_cluster_distribution(file_names, pc=0.592746):
 
     # Subplot for p > pc
     plt.subplot(1, 3, 3)
-    for file_name in file_names:
-        p = float(file_name.split('_')[1][1:])
+    for p, s, n_s in distributions:
         if p > pc:
-            s, n_s = read_cluster_distribution(file_name)
             plt.loglog(s, n_s, label=f'p={p:.2f}')
     plt.xlabel('Cluster size s')
     plt.ylabel('n(s, p, L)')
@@ -165,10 +199,21 @@ def plot_cluster_distribution(file_names, pc=0.592746):
     plt.tight_layout()
     plt.show()
 
-# Example usage:
-file_names = [
-    'Dist_p0.20_L10_T1000.txt', 'Dist_p0.30_L10_T1000.txt', 'Dist_p0.40_L10_T1000.txt',
-    'Dist_p0.50_L10_T1000.txt', 'Dist_p0.592746_L10_T1000.txt', 'Dist_p0.60_L10_T1000.txt',
-    'Dist_p0.70_L10_T1000.txt', 'Dist_p0.80_L10_T1000.txt'
-]
-plot_cluster_distribution(file_names)
\ No newline at end of file
+if __name__ == '__main__':
+    # Example usage:
+    file_names = ['Ave_L10_T1000.txt', 'Ave_L50_T1000.txt', 'Ave_L100_T1000.txt']
+    data = read_percolation_data(file_names)
+    plot_percolation_data(data)
+
+    visualize_configurations('Ave_L10_T1000.txt')
+
+    file_names = [
+        'Dist_p0.20_L10_T1000.txt', 'Dist_p0.30_L10_T1000.txt', 'Dist_p0.40_L10_T1000.txt',
+        'Dist_p0.50_L10_T1000.txt', 'Dist_p0.592746_L10_T1000.txt', 'Dist_p0.60_L10_T1000.txt',
+        'Dist_p0.70_L10_T1000.txt', 'Dist_p0.80_L10_T1000.txt'
+    ]
+    plot_cluster_distribution(file_names)
+
+    # Sweeps saved by percolation.save_sweep carry L, T and every distribution in one file:
+    # plot_percolation_data(read_sweep_data(['Sweep_L10_T1000.npz']))
+    # plot_sweep_distribution('Sweep_L10_T1000.npz')
\ No newline at end of file
@@ -1,7 +1,21 @@
+import hashlib
+import json
+import os
 import numpy as np
 import random
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from scipy.ndimage import label
 
+try:
+    from numba import njit
+    compiled = njit(cache=True)
+except ImportError:
+    compiled = lambda function: function
+
+# Statistics of a batch of samples at one p
+PartialStats = namedtuple('PartialStats', ['flow_count', 'max_size_sum', 'samples_with_clusters', 'distribution'])
+
 def load_parameters(file_name):
     with open(file_name, 'r') as f:
         params = {}
@@ -17,73 +31,253 @@ def load_parameters(file_name):
                 print(f"Error parsing line '{line}': {e}")
     return params
 
-def initialize_lattice(L, p):
-    return (np.random.rand(L, L) < p).astype(int)
+def initialize_lattice(L, p, rng=None):
+    random_field = np.random.rand(L, L) if rng is None else rng.random((L, L))
+    return (random_field < p).astype(int)
+
+def percolation_kernel(lattice):  # (spans, spanning labels, cluster sizes) from one labeling
+    labeled_lattice, num_features = label(lattice)
+    on_top = np.zeros(num_features + 1, dtype=bool)
+    on_top[labeled_lattice[0]] = True
+    on_top[0] = False  # background
+    bottom = labeled_lattice[-1]
+    spanning_labels = np.unique(bottom[on_top[bottom]])
+    cluster_sizes = np.bincount(labeled_lattice.ravel(), minlength=num_features + 1)[1:]
+    return spanning_labels.size > 0, spanning_labels, cluster_sizes
+
 
 def check_connectivity(lattice):
-    L = lattice.shape[0]
-    visited = np.zeros_like(lattice, dtype=bool)
+    return percolation_kernel(lattice)[0]
 
-    # Start burning from all occupied sites in the top row
-    burn_stack = [(0, col) for col in range(L) if lattice[0, col] == 1]
 
-    while burn_stack:
-        x, y = burn_stack.pop()
+def hoshen_kopelman(lattice):
+    return percolation_kernel(lattice)[2]
 
-        if visited[x, y]:
-            continue
 
-        visited[x, y] = True
+class SizeHistogram:  # cluster-size counts indexed by size, grown as far as the largest cluster
 
-        # Check if we reached the bottom row
-        if x == L - 1:
-            return True
+    def __init__(self, counts=None):
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else np.array(counts, dtype=np.int64)
 
-        # Add neighbors to the burn stack
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < L and 0 <= ny < L and lattice[nx, ny] == 1 and not visited[nx, ny]:
-                burn_stack.append((nx, ny))
+    def add_counts(self, counts):
+        if len(counts) > len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(len(counts) - len(self.counts), dtype=np.int64)])
+        self.counts[:len(counts)] += counts
+        return self
 
-    return False
+    def add_sizes(self, cluster_sizes):
+        return self.add_counts(np.bincount(cluster_sizes))
 
+    def merge(self, other):
+        return self.add_counts(other.counts)
 
-def hoshen_kopelman(lattice):
-    labeled_lattice, num_features = label(lattice)
-    cluster_sizes = np.bincount(labeled_lattice.ravel())[1:]  # Exclude background
-    return cluster_sizes
 
+def sample_batch(task):  # `samples` fresh lattices at one p, drawn from this batch's own seed
+    L, p, samples, seed = task
+    rng = np.random.default_rng(seed)
+    flow_count = 0
+    max_size_sum = 0
+    samples_with_clusters = 0
+    distribution = SizeHistogram()
 
-def monte_carlo(L, T, p_range):
-    p_min, p_max, dp = p_range
-    probabilities = []
-    max_cluster_sizes = []
-    cluster_distributions = {}
+    for _ in range(samples):
+        spans, _, cluster_sizes = percolation_kernel(initialize_lattice(L, p, rng))
+        flow_count += int(spans)
+        if cluster_sizes.size > 0:
+            max_size_sum += int(cluster_sizes.max())
+            samples_with_clusters += 1
+        distribution.add_sizes(cluster_sizes)
 
-    p_values = np.arange(p_min, p_max + dp, dp)
+    return PartialStats(flow_count, max_size_sum, samples_with_clusters, distribution.counts)
+
+
+def write_atomically(path, write):  # write(file) fills a temp file that only replaces path once complete
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as file:
+        write(file)
+    os.replace(temp_path, path)
+
+
+def sparse_distributions(distributions):  # offsets, sizes, counts: the nonzero entries of every histogram in a row
+    sizes = [np.flatnonzero(distribution) for distribution in distributions]
+    counts = [np.asarray(distribution)[nonzero] for distribution, nonzero in zip(distributions, sizes)]
+    offsets = np.concatenate([[0], np.cumsum([len(nonzero) for nonzero in sizes])]).astype(np.int64)
+    return (offsets, np.concatenate(sizes).astype(np.int64) if sizes else np.zeros(0, dtype=np.int64),
+            np.concatenate(counts).astype(np.int64) if counts else np.zeros(0, dtype=np.int64))
+
+
+def dense_distribution(sizes, counts):  # inverse of one sparse_distributions entry
+    distribution = np.zeros(sizes[-1] + 1 if len(sizes) else 0, dtype=np.int64)
+    distribution[sizes] = counts
+    return distribution
 
-    for p in p_values:
-        flow_count = 0
-        max_sizes = []
-        cluster_size_distribution = []
 
-        for _ in range(int(T)):
-            lattice = initialize_lattice(L, p)
+CHECKPOINT_FORMAT = 2
 
-            # Check connectivity
-            if check_connectivity(lattice):
-                flow_count += 1
 
-            # Calculate maximum cluster size
-            cluster_sizes = hoshen_kopelman(lattice)
-            if cluster_sizes.size > 0:
-                max_sizes.append(cluster_sizes.max())
+def save_partials(path, partials):  # one finished batch: its statistics for every p it covered
+    offsets, sizes, counts = sparse_distributions([partial.distribution for partial in partials])
+    write_atomically(path, lambda file: np.savez(
+        file, flow_count=[partial.flow_count for partial in partials],
+        max_size_sum=[partial.max_size_sum for partial in partials],
+        samples_with_clusters=[partial.samples_with_clusters for partial in partials],
+        dist_offsets=offsets, dist_sizes=sizes, dist_counts=counts))
 
-            cluster_size_distribution.extend(cluster_sizes)
 
-        probabilities.append(flow_count / T)
-        max_cluster_sizes.append(np.mean(max_sizes) if max_sizes else 0)
-        cluster_distributions[p] = np.bincount(cluster_size_distribution)
+def load_partials(path):
+    with np.load(path) as data:
+        offsets, sizes, counts = data['dist_offsets'], data['dist_sizes'], data['dist_counts']
+        return [PartialStats(int(flow), int(max_sum), int(with_clusters),
+                             dense_distribution(sizes[offsets[k]:offsets[k + 1]], counts[offsets[k]:offsets[k + 1]]))
+                for k, (flow, max_sum, with_clusters) in enumerate(zip(data['flow_count'], data['max_size_sum'],
+                                                                       data['samples_with_clusters']))]
+
+
+@compiled
+def find_root(parent, site):  # union-find root with path halving
+    while parent[site] != site:
+        parent[site] = parent[parent[site]]
+        site = parent[site]
+    return site
+
+
+# Occupy order[start:stop]; returns the new largest cluster size and spanning flag
+@compiled
+def newman_ziff(order, L, start, stop, parent, size, top, bottom, size_counts, largest, spanning):
+    N = L * L
+    for n in range(start, stop):
+        site = order[n]
+        parent[site] = site
+        size[site] = 1
+        top[site] = site < L
+        bottom[site] = site >= N - L
+        size_counts[1] += 1
+        root = site
+        row, col = site // L, site % L
+        for neighbour, inside in ((site - L, row > 0), (site + L, row < L - 1),
+                                  (site - 1, col > 0), (site + 1, col < L - 1)):
+            if not inside or parent[neighbour] < 0:
+                continue
+            other = find_root(parent, neighbour)
+            if other == root:
+                continue
+            if size[other] > size[root]:
+                root, other = other, root
+            size_counts[size[root]] -= 1
+            size_counts[size[other]] -= 1
+            parent[other] = root
+            size[root] += size[other]
+            size_counts[size[root]] += 1
+            top[root] |= top[other]
+            bottom[root] |= bottom[other]
+
+        largest = max(largest, size[root])
+        spanning |= top[root] and bottom[root]
+    return largest, spanning
+
+
+def newman_ziff_batch(task):  # one union-find pass per random field covers every p of the sweep
+    L, p_values, samples, seed = task
+    rng = np.random.default_rng(seed)
+    N = L * L
+    flow = np.zeros(len(p_values), dtype=np.int64)
+    max_sizes = np.zeros(len(p_values), dtype=np.int64)
+    samples_with_clusters = np.zeros(len(p_values), dtype=np.int64)
+    distributions = [SizeHistogram() for _ in p_values]
+
+    for _ in range(samples):
+        random_field = rng.random(N)
+        order = np.argsort(random_field, kind='stable')
+        # occupied sites at p are those with random_field < p, as in initialize_lattice
+        checkpoints = np.searchsorted(random_field[order], p_values, side='left')
+        parent = np.full(N, -1, dtype=np.int64)  # -1 marks an empty site
+        size = np.zeros(N, dtype=np.int64)
+        top = np.zeros(N, dtype=np.bool_)
+        bottom = np.zeros(N, dtype=np.bool_)
+        size_counts = np.zeros(N + 1, dtype=np.int64)
+        largest, spanning, occupied = 0, False, 0
+        for k, stop in enumerate(checkpoints):
+            largest, spanning = newman_ziff(order, L, occupied, stop, parent, size, top, bottom, size_counts,
+                                            largest, spanning)
+            occupied = stop
+            flow[k] += spanning
+            max_sizes[k] += largest
+            distributions[k].add_counts(size_counts[:largest + 1])  # no cluster is bigger than largest
+        samples_with_clusters += checkpoints > 0
+
+    return [PartialStats(int(flow[k]), int(max_sizes[k]), int(samples_with_clusters[k]),
+                         np.trim_zeros(distributions[k].counts, 'b')) for k in range(len(p_values))]
+
+
+# method 'independent' draws new lattices per p, 'newman-ziff' thresholds one random field per sample at every p;
+# with checkpoint_dir and a fixed seed, a rerun of the same sweep only computes the missing batches
+def monte_carlo(L, T, p_range, workers=None, seed=None, batch_size=50, method='independent', checkpoint_dir=None):
+    if checkpoint_dir is not None and seed is None:
+        raise ValueError("checkpoint_dir needs an explicit seed, otherwise a rerun never finds its earlier batches")
+    p_min, p_max, dp = p_range
+    probabilities = []
+    max_cluster_sizes = []
+    cluster_distributions = {}
+
+    p_values = np.arange(p_min, p_max + dp, dp)
+
+    T = int(T)
+    batches = [min(batch_size, T - start) for start in range(0, T, batch_size)]
+    root = np.random.SeedSequence(seed)
+    if method == 'newman-ziff':
+        seeds = root.spawn(len(batches))
+        run = newman_ziff_batch
+        tasks = [(L, p_values, samples, batch_seed) for samples, batch_seed in zip(batches, seeds)]
+    else:
+        seeds = root.spawn(len(p_values) * len(batches))
+        run = sample_batch
+        tasks = [(L, p, samples, seeds[i * len(batches) + j]) for i, p in enumerate(p_values)
+                 for j, samples in enumerate(batches)]
+
+    # Running totals per p; batches are folded in as they finish and dropped
+    flow_count = np.zeros(len(p_values), dtype=np.int64)
+    max_size_sum = np.zeros(len(p_values), dtype=np.int64)
+    samples_with_clusters = np.zeros(len(p_values), dtype=np.int64)
+    distributions = [SizeHistogram() for _ in p_values]
+
+    def fold(i, partials):
+        p_indices = range(len(p_values)) if method == 'newman-ziff' else [i // len(batches)]
+        for k, partial in zip(p_indices, partials):
+            flow_count[k] += partial.flow_count
+            max_size_sum[k] += partial.max_size_sum
+            samples_with_clusters[k] += partial.samples_with_clusters
+            distributions[k].add_counts(partial.distribution)
+
+    paths = [None] * len(tasks)
+    pending = list(range(len(tasks)))
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        sweep = f"{CHECKPOINT_FORMAT}|{method}|{L}|{T}|{batch_size}|{root.entropy}|{p_values.tobytes().hex()}"
+        key = hashlib.sha256(sweep.encode('utf-8')).hexdigest()[:16]
+        paths = [os.path.join(checkpoint_dir, f"{key}_{i}.npz") for i in range(len(tasks))]
+        for i in [i for i in pending if os.path.exists(paths[i])]:
+            fold(i, load_partials(paths[i]))
+            pending.remove(i)
+
+    def finish(i, result):
+        partials = result if method == 'newman-ziff' else [result]
+        if paths[i] is not None:
+            save_partials(paths[i], partials)
+        fold(i, partials)
+
+    if workers == 1 or len(pending) <= 1:
+        for i in pending:
+            finish(i, run(tasks[i]))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run, tasks[i]): i for i in pending}
+            for future in as_completed(futures):
+                finish(futures.pop(future), future.result())
+
+    for k, p in enumerate(p_values):
+        probabilities.append(flow_count[k] / T)
+        max_cluster_sizes.append(max_size_sum[k] / samples_with_clusters[k] if samples_with_clusters[k] else 0)
+        cluster_distributions[p] = distributions[k].counts
 
     return p_values, probabilities, max_cluster_sizes, cluster_distributions
 
@@ -101,6 +295,20 @@ def save_results(p_values, probabilities, max_cluster_sizes, cluster_distributio
                 f.write(f"{size}  {count}\n")
 
 
+SWEEP_FORMAT = 1
+
+
+# One uncompressed .npz with sparse distributions, memory-mappable by load_sweep
+def save_sweep(file_name, p_values, probabilities, max_cluster_sizes, cluster_distributions, L, T, **metadata):
+    offsets, sizes, counts = sparse_distributions([cluster_distributions[p] for p in p_values])
+    metadata = dict(metadata, format=SWEEP_FORMAT, L=int(L), T=int(T))
+
+    write_atomically(file_name, lambda file: np.savez(
+        file, L=np.int64(L), T=np.int64(T), p_values=np.asarray(p_values, dtype=float),
+        p_flow=np.asarray(probabilities, dtype=float), s_max=np.asarray(max_cluster_sizes, dtype=float),
+        dist_offsets=offsets, dist_sizes=sizes, dist_counts=counts, metadata=np.array(json.dumps(metadata))))
+
+
 def main():
     params = load_parameters("perc_ini.txt")
     L = int(params["L"])
@@ -114,6 +322,8 @@ def main():
     )
 
     save_results(p_values, probabilities, max_cluster_sizes, cluster_distributions, L, T)
+    save_sweep(f"Sweep_L{L}_T{T}.npz", p_values, probabilities, max_cluster_sizes, cluster_distributions, L, T,
+               p_range=[p_min, p_max, dp])
 
 if __name__ == "__main__":
     main()